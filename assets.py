@@ -0,0 +1,81 @@
+import gzip
+import json
+import mimetypes
+import os
+from flask import request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+
+
+# responses worth compressing on the fly; static assets come precompressed
+COMPRESSIBLE = {"text/html", "application/json", "text/plain"}
+MIN_COMPRESS_SIZE = 500
+
+
+class Assets:
+    def __init__(self, static_folder, dist="dist"):
+        self.dist_folder = os.path.join(static_folder, dist)
+        self._manifest = None
+
+    def init_app(self, app):
+        app.add_url_rule("/assets/<path:filename>", "assets", self.send)
+        app.add_template_global(self.url, "asset_url")
+        # registered before the other after_request hooks so it runs last,
+        # once the body is final
+        app.after_request(self.compress)
+
+    def manifest(self):
+        # written by build_assets.py; without a build every asset falls back
+        # to its plain /static url
+        if self._manifest is None:
+            try:
+                with open(os.path.join(self.dist_folder, "manifest.json")) as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+        return self._manifest
+
+    def url(self, filename):
+        fingerprinted = self.manifest().get(filename)
+        if fingerprinted is None:
+            return url_for("static", filename=filename)
+        return url_for("assets", filename=fingerprinted)
+
+    def send(self, filename):
+        # fingerprinted names never change content, so they are cached for a
+        # year and the smallest precompressed variant the client accepts is sent
+        if filename.endswith((".gz", ".br")):
+            raise NotFound()
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        sent, encoding = filename, None
+        for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if candidate in request.accept_encodings and os.path.isfile(os.path.join(self.dist_folder, filename + suffix)):
+                sent, encoding = filename + suffix, candidate
+                break
+
+        response = send_from_directory(self.dist_folder, sent, mimetype=mimetype, max_age=31536000)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def compress(self, response):
+        # rendered pages get an ETag (so a repeat visit is a 304) and gzip;
+        # streamed responses (the SSE feed) and files are left alone
+        if response.mimetype not in COMPRESSIBLE or response.status_code != 200 \
+                or response.is_streamed or response.direct_passthrough or "Content-Encoding" in response.headers:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        if "gzip" in request.accept_encodings and len(body) >= MIN_COMPRESS_SIZE:
+            response.set_data(gzip.compress(body, compresslevel=6))
+            response.headers["Content-Encoding"] = "gzip"
+
+        if response.mimetype == "text/html" and not response.cache_control.no_store:
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        response.add_etag()
+        return response.make_conditional(request)
@@ -0,0 +1,216 @@
+"""Load test for the voter flow: code entry, ballot render and submission.
+
+Drives the real Flask app through its test client from a pool of threads,
+against a throwaway database on the embedded SQLite backend, and reports
+latency percentiles, throughput, queries per request and commits per ballot.
+
+    python benchmark.py --voters 500 --concurrency 20 --positions 10 --candidates 3
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import main
+from database.sqlite import SQLiteDatabase, Connection
+from journal import BallotJournal
+
+
+DRAINER = "journal-drainer"
+
+
+class Counters:
+    # shared by every thread and kept per thread name: a simulated voter runs
+    # its requests on one thread, and ballots are committed on the drainer's
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = defaultdict(int)
+        self.commits = defaultdict(int)
+
+    def count(self, counter):
+        with self._lock:
+            counter[threading.current_thread().name] += 1
+
+    def mine(self):
+        name = threading.current_thread().name
+        with self._lock:
+            return self.queries[name], self.commits[name]
+
+
+class CountingConnection(Connection):
+    def __init__(self, raw, translated, counters):
+        super().__init__(raw, translated)
+        self.counters = counters
+
+    def commit(self):
+        self.counters.count(self.counters.commits)
+        super().commit()
+
+
+class BenchDatabase(SQLiteDatabase):
+    def __init__(self, path):
+        super().__init__(path)
+        self.counters = Counters()
+        self.add_listener(self._count)
+
+    def _count(self, sql, elapsed, rowcount):
+        self.counters.count(self.counters.queries)
+
+    def _connect(self):
+        conn = super()._connect()
+        return CountingConnection(conn.raw, self._translated, self.counters)
+
+
+def seed(db, positions, candidates, voters):
+    db.bootstrap()
+    for p in range(1, positions + 1):
+        db.insert("positions", ["name"], [f"Position {p}"])
+        db.insert_many(
+            "candidates", ["full_name", "class_name", "gender", "photo_url", "position_id"],
+            [[f"Candidate {p}-{c}", "Form 1", "Male", "uploads/default.jpg", p] for c in range(candidates)]
+        )
+    codes = [f"BENCH{i:06d}" for i in range(voters)]
+    db.insert_many("voting_codes", ["code", "has_voted"], [[code, "No"] for code in codes])
+    db.insert("election_sessions", ["name", "active"], ["benchmark", 1])
+
+    ballot = defaultdict(list)
+    for candidate_id, position_id in db.read("candidates", columns=["id", "position_id"]):
+        ballot[position_id].append(candidate_id)
+    return codes, ballot
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[index]
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="nominex-bench-")
+    path = os.path.join(workdir, "bench.db")
+    db = BenchDatabase(path)
+    codes, ballot = seed(db, args.positions, args.candidates, args.voters)
+    db.init_app(main.app)
+    db.add_listener(main.profiler.record)
+    main.db = db
+    main.journal = BallotJournal(
+        os.path.join(workdir, "ballots.journal"), main.apply_ballot, main.used_codes,
+        transient=db.UNAVAILABLE, logger=main.app.logger
+    )
+
+    timings = defaultdict(list)
+    queries = defaultdict(list)
+    commits = []
+    failures = defaultdict(int)
+    lock = threading.Lock()
+
+    def step(name, call, expected):
+        queries_before, commits_before = db.counters.mine()
+        started = time.perf_counter()
+        response = call()
+        elapsed = time.perf_counter() - started
+        queries_after, commits_after = db.counters.mine()
+        ok = response.status_code == 302 and response.location.endswith(expected) if expected else response.status_code == 200
+        with lock:
+            timings[name].append(elapsed)
+            queries[name].append(queries_after - queries_before)
+            if not ok:
+                failures[name] += 1
+        return commits_after - commits_before
+
+    def voter(code):
+        client = main.app.test_client()
+        step("login", lambda: client.post("/", data={"vote_code": code}), "/vote")
+        step("ballot", lambda: client.get("/vote"), None)
+        form = {f"vote_{p}": str(random.choice(ids)) for p, ids in ballot.items()}
+        ballot_commits = step("submit", lambda: client.post("/vote", data=form), "/thank-you")
+        with lock:
+            commits.append(ballot_commits)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(voter, codes))
+    wall = time.perf_counter() - started
+    # voters are answered once their ballot is journaled; this is the time
+    # until the database has all of them too
+    main.journal.drain(timeout=300)
+    applied = time.perf_counter() - started
+    journal = main.journal.stats()
+
+    report = {
+        "voters": args.voters,
+        "concurrency": args.concurrency,
+        "positions": args.positions,
+        "candidates_per_position": args.candidates,
+        "wall_seconds": round(wall, 3),
+        "ballots_per_second": round(args.voters / wall, 1),
+        "applied_seconds": round(applied, 3),
+        "commits_per_ballot": round(sum(commits) / len(commits), 2) if commits else 0,
+        "drainer_commits_per_ballot": round(db.counters.commits[DRAINER] / journal["applied"], 2) if journal["applied"] else 0,
+        "commits": sum(db.counters.commits.values()),
+        "journal": journal,
+        "pool": db.pool_stats(),
+        "slowest_statements": db.statement_stats()[:5],
+        "steps": {}
+    }
+    for name in ("login", "ballot", "submit"):
+        samples = timings[name]
+        report["steps"][name] = {
+            "requests": len(samples),
+            "failures": failures[name],
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "queries_per_request": round(sum(queries[name]) / len(queries[name]), 2) if queries[name] else 0
+        }
+
+    main.journal.stop()
+    main.tally.stop()
+    db.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report):
+    print(f"{report['voters']} voters, {report['concurrency']} concurrent, "
+          f"{report['positions']} positions x {report['candidates_per_position']} candidates")
+    print(f"{report['wall_seconds']}s wall, {report['ballots_per_second']} ballots/s, "
+          f"{report['commits_per_ballot']} commits/ballot on the request thread, "
+          f"all in the database after {report['applied_seconds']}s")
+    print(f"{report['drainer_commits_per_ballot']} commits per applied ballot on the journal drainer, "
+          f"{report['commits']} commits in all")
+    print(f"{'step':<8}{'reqs':>7}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for name, s in report["steps"].items():
+        print(f"{name:<8}{s['requests']:>7}{s['failures']:>6}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}"
+              f"{s['queries_per_request']:>9}")
+    print(f"journal: {report['journal']}")
+    print(f"pool: {report['pool']}")
+    print(f"{'calls':>7}{'total ms':>11}{'avg ms':>9}{'max ms':>9}  slowest statements")
+    for s in report["slowest_statements"]:
+        print(f"{s['calls']:>7}{s['total_ms']:>11}{s['avg_ms']:>9}{s['max_ms']:>9}  {s['sql'][:100]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the voter flow against a throwaway SQLite database.")
+    parser.add_argument("--voters", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--positions", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
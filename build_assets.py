@@ -0,0 +1,129 @@
+"""Fingerprint and precompress the static assets for offline serving.
+
+Copies every file under static/ (except uploads and generated exports) to
+static/dist/ with a content hash in its name, writes .gz (and .br when the
+brotli module is installed) next to each text asset, and records the
+mapping in static/dist/manifest.json for asset_url() in assets.py.
+
+    python build_assets.py            # rebuild static/dist
+    python build_assets.py --vendor   # refresh static/vendor from Bootstrap-Flask first
+
+Bootstrap is vendored from the Bootstrap-Flask package already pinned in
+requirements.txt, so no network access is needed at any point.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC = "static"
+DIST = os.path.join(STATIC, "dist")
+SKIP = {"dist", "uploads", "codes", "results"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+SOURCE_MAP = re.compile(r"\n?/[/*]# sourceMappingURL=[^\n]*")
+
+
+def vendor():
+    import flask_bootstrap
+
+    source = os.path.join(os.path.dirname(flask_bootstrap.__file__), "static", "bootstrap5")
+    target = os.path.join(STATIC, "vendor", "bootstrap")
+    os.makedirs(target, exist_ok=True)
+
+    # the .map files are not shipped, so their references are dropped too
+    for name, path in [
+        ("bootstrap.min.css", os.path.join(source, "css", "bootstrap.min.css")),
+        ("bootstrap.min.js", os.path.join(source, "js", "bootstrap.min.js")),
+        ("popper.min.js", os.path.join(source, "umd", "popper.min.js")),
+    ]:
+        with open(path, encoding="utf-8") as f:
+            content = SOURCE_MAP.sub("", f.read())
+        with open(os.path.join(target, name), "w", encoding="utf-8") as f:
+            f.write(content)
+        print(f"vendored {name}")
+
+
+def sources():
+    for root, dirs, files in os.walk(STATIC):
+        rel_root = os.path.relpath(root, STATIC).replace(os.sep, "/")
+        if rel_root == ".":
+            dirs[:] = [d for d in dirs if d not in SKIP]
+            rel_root = ""
+        for name in sorted(files):
+            yield posixpath.join(rel_root, name) if rel_root else name
+
+
+def fingerprint(name, content):
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha1(content).hexdigest()[:10]}{ext}"
+
+
+def rewrite_css(name, content, manifest):
+    # url(../img/x.png) has to point at the fingerprinted copy as well
+    def replace(match):
+        quote, url = match.groups()
+        if url.startswith(("data:", "http:", "https:", "/", "#")):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(name), url))
+        if target not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[target], posixpath.dirname(name))
+        return f"url({quote}{relative}{quote})"
+
+    return CSS_URL.sub(replace, content.decode("utf-8")).encode("utf-8")
+
+
+def write(name, content):
+    path = os.path.join(DIST, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+    if posixpath.splitext(name)[1] in COMPRESSIBLE:
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(content))
+
+
+def build():
+    if os.path.isdir(DIST):
+        shutil.rmtree(DIST)
+
+    names = list(sources())
+    manifest = {}
+    # stylesheets last, so the files they reference are already fingerprinted
+    for name in sorted(names, key=lambda n: n.endswith(".css")):
+        with open(os.path.join(STATIC, name), "rb") as f:
+            content = f.read()
+        if name.endswith(".css"):
+            content = rewrite_css(name, content, manifest)
+
+        manifest[name] = fingerprint(name, content)
+        write(manifest[name], content)
+
+    with open(os.path.join(DIST, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress static assets into static/dist.")
+    parser.add_argument("--vendor", action="store_true", help="refresh static/vendor from Bootstrap-Flask first")
+    args = parser.parse_args()
+
+    if args.vendor:
+        vendor()
+    manifest = build()
+    print(f"built {len(manifest)} asset(s) into {DIST}{'' if brotli else ' (install brotli for .br variants)'}")
@@ -0,0 +1,64 @@
+import threading
+
+
+class BallotCache:
+    def __init__(self, load):
+        self.load = load
+        self._lock = threading.Lock()
+        self._version = 0
+        self._data = None
+        self._html = None
+
+    def get(self):
+        data = self._data
+        if data is not None:
+            return data
+
+        with self._lock:
+            if self._data is None:
+                self._data = self.load()
+            return self._data
+
+    def render(self, render):
+        html = self._html
+        if html is not None:
+            return html
+
+        data = self.get()
+        with self._lock:
+            version = self._version
+        html = render(data)
+
+        with self._lock:
+            # an invalidation while rendering means this html is already stale
+            if version == self._version:
+                self._html = html
+        return html
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._data = None
+            self._html = None
+
+
+class ResultsCache:
+    # final results of a closed session never change, so they are kept
+    # per session id until an admin write (reset, candidate edit) clears them
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def get(self, session_id, load):
+        results = self._results.get(session_id)
+        if results is not None:
+            return results
+
+        results = load(session_id)
+        with self._lock:
+            self._results[session_id] = results
+        return results
+
+    def invalidate(self):
+        with self._lock:
+            self._results.clear()
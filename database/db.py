@@ -1,116 +1,495 @@
+import re
+import threading
+import time
 import pymysql
+from collections import namedtuple
+from contextlib import contextmanager
+from flask import g, has_app_context
+from database.pool import ConnectionPool, PoolTimeout
+
+# errors after which a connection can no longer be trusted
+CONNECTION_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+
+# table and column names are the only parts of a statement that are not
+# parameterized, so they are checked before being spliced into the SQL text
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# besides plain names, a select may ask for an aggregate of one column and
+# sort on a name with a direction
+AGGREGATE = re.compile(r"^(COUNT|MIN|MAX|SUM|AVG)\((\*|[A-Za-z_][A-Za-z0-9_]*)\)$", re.IGNORECASE)
+ORDER_TERM = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)(?:\s+(ASC|DESC))?$", re.IGNORECASE)
+
+STATEMENT_CACHE_SIZE = 1000
+
+# statements are reported by shape: whitespace collapsed and IN lists folded,
+# so a ballot with 3 or 10 selections counts as the same statement
+WHITESPACE = re.compile(r"\s+")
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+# an unbuffered SSCursor reports -1 as an unsigned 64-bit rowcount until it is
+# drained, and sqlite reports -1 for a SELECT: neither is a number of rows
+UNKNOWN_ROWCOUNT = 2 ** 63
+
+
+def known_rowcount(rowcount):
+    if rowcount is None or rowcount < 0 or rowcount >= UNKNOWN_ROWCOUNT:
+        return None
+    return rowcount
+
 
 class Database:
-    def __init__(self, host, user, password, database):
+    # what a caller that can wait for the database (the ballot journal)
+    # retries on; any other error will fail again the same way
+    UNAVAILABLE = CONNECTION_ERRORS + (PoolTimeout,)
+
+    def __init__(self, host, user, password, database, pool_size=10, pool_timeout=30):
         self.host, self.user, self.password, self.database = host, user, password, database
-        
-        # create connection
+
+        # connections are opened lazily and handed out one per request
+        self.pool = ConnectionPool(self._connect, size=pool_size, timeout=pool_timeout)
+        self._g_key = f"_db_conn_{id(self)}"
+        self._local = threading.local()
+
+        # generated SQL text keyed by statement shape, and timings per statement
+        self._statements = {}
+        self._stats_lock = threading.Lock()
+        self._statement_stats = {}
+        self._normalized = {}
+        self._record_types = {}
+        self._listeners = []
+
+    def _connect(self):
+        return pymysql.connect(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database
+        )
+
+    def init_app(self, app):
+        app.teardown_appcontext(self.release)
+
+    def release(self, exc=None):
+        if has_app_context():
+            conn = g.pop(self._g_key, None)
+            if conn is not None:
+                self.pool.release(conn)
+
+    @contextmanager
+    def _cursor(self, cursor_class=None):
+        tx = getattr(self._local, "tx", None)
+        if tx is not None:
+            with tx.cursor(cursor_class) as cursor:
+                yield cursor
+            return
+
+        # inside a request the connection is checked out once and returned on
+        # teardown, outside of one (scripts, threads) it is held per call
+        held = has_app_context()
+        if held:
+            conn = g.get(self._g_key)
+            if conn is None:
+                conn = self.pool.acquire()
+                setattr(g, self._g_key, conn)
+        else:
+            conn = self.pool.acquire()
+
+        broken = False
+        try:
+            with conn.cursor(cursor_class) as cursor:
+                yield cursor
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        finally:
+            if broken and held:
+                g.pop(self._g_key, None)
+            if broken or not held:
+                self.pool.release(conn, discard=broken)
+
+    @contextmanager
+    def transaction(self):
+        # writes issued inside the block share one connection and are
+        # committed together, nested blocks join the outer transaction
+        if getattr(self._local, "tx", None) is not None:
+            yield
+            return
+
+        with self._cursor() as cursor:
+            conn = cursor.connection
+            self._local.tx = conn
+            try:
+                yield
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                self._local.tx = None
+
+    def _commit(self, cursor):
+        if getattr(self._local, "tx", None) is None:
+            cursor.connection.commit()
+
+    def _run(self, cursor, sql, values=(), many=False):
+        started = time.perf_counter()
+        rowcount = None
         try:
-            self.my_db = pymysql.connect(
-                host=self.host, 
-                user=self.user, 
-                password=self.password, 
-                database=self.database
-            )
-        
-            self.cursor = self.my_db.cursor()
-            self.sql = ""
-
-        except Exception as err:
-            print(err)
+            if many:
+                rowcount = cursor.executemany(sql, values)
+            else:
+                rowcount = cursor.execute(sql, values)
+            return rowcount
+        finally:
+            self._record(sql, time.perf_counter() - started, known_rowcount(rowcount))
+
+    def add_listener(self, listener):
+        # listener(sql, elapsed, rowcount) is called after every statement, on
+        # the thread that ran it; rowcount is None when the statement failed or
+        # the driver could not tell
+        self._listeners.append(listener)
+
+    def normalize(self, sql):
+        normalized = self._normalized.get(sql)
+        if normalized is None:
+            if len(self._normalized) >= STATEMENT_CACHE_SIZE:
+                self._normalized.clear()
+            normalized = IN_LIST.sub("IN (%s, ...)", WHITESPACE.sub(" ", sql).strip())
+            self._normalized[sql] = normalized
+        return normalized
+
+    def _record(self, sql, elapsed, rowcount=None):
+        sql = self.normalize(sql)
+        with self._stats_lock:
+            stats = self._statement_stats.get(sql)
+            if stats is None:
+                stats = self._statement_stats[sql] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += rowcount or 0
+
+        for listener in self._listeners:
+            listener(sql, elapsed, rowcount)
+
+    def _statement(self, key, build):
+        sql = self._statements.get(key)
+        if sql is None:
+            if len(self._statements) >= STATEMENT_CACHE_SIZE:
+                self._statements.clear()
+            sql = self._statements[key] = build()
+        return sql
+
+    def _rows(self, cursor, rows):
+        # rows come back as namedtuples (slotted, still indexable) named after
+        # the selected columns, one class per distinct column list
+        names = tuple(column[0] for column in cursor.description)
+        record = self._record_types.get(names)
+        if record is None:
+            record = self._record_types[names] = namedtuple("Row", names, rename=True)
+        return [record._make(row) for row in rows]
+
+    def _identifier(self, name):
+        if not IDENTIFIER.match(name):
+            raise ValueError(f"Invalid identifier: {name!r}")
+        return name
+
+    def _column(self, name):
+        if not (IDENTIFIER.match(name) or AGGREGATE.match(name)):
+            raise ValueError(f"Invalid column: {name!r}")
+        return name
+
+    def _order(self, order_by):
+        for term in order_by.split(","):
+            if not ORDER_TERM.match(term.strip()):
+                raise ValueError(f"Invalid order: {order_by!r}")
+        return order_by
+
+    def _clause(self, clause, like=False, prefix=()):
+        # split a clause into its shape (what the SQL text depends on) and values
+        shape = []
+        values = []
+        for key, val in clause.items():
+            # like is either True for every column or a collection of column names;
+            # prefix columns match from the start, which an index on them can serve
+            if key in prefix:
+                shape.append((key, "like", 0))
+                values.append(f"{self._escape_like(val)}%")
+            elif like is True or (like and key in like):
+                shape.append((key, "like", 0))
+                values.append(f"%{self._escape_like(val)}%")
+            elif isinstance(val, (list, tuple, set)):
+                val = list(val)
+                shape.append((key, "in", len(val)))
+                values.extend(val)
+            else:
+                shape.append((key, "eq", 0))
+                values.append(val)
+        return tuple(shape), values
+
+    def _escape_like(self, value):
+        # user input matches literally; "!" rather than a backslash because
+        # MySQL and SQLite read a backslash in the ESCAPE literal differently
+        return re.sub(r"([!%_])", r"!\1", str(value))
+
+    def _where(self, shape):
+        conditions = []
+        for key, kind, size in shape:
+            key = self._identifier(key)
+            if kind == "like":
+                conditions.append(f"{key} LIKE %s ESCAPE '!'")
+            elif kind == "in":
+                conditions.append(f"{key} IN ({', '.join(['%s'] * size)})" if size else "1 = 0")
+            else:
+                conditions.append(f"{key} = %s")
+        return " AND ".join(conditions)
+
 
     def insert(self, table, columns, values):
-        self.sql = f"INSERT INTO {table} ("
-        if isinstance(columns, list):
-            for col in columns:
-                self.sql += f"`{col}`, "
-            self.sql = self.sql.rstrip(", ")
-            self.sql += ") VALUES ("
-        else:
+        if not isinstance(columns, list):
             raise TypeError(f"Expected a list but found {type(columns)}")
-        
-        if isinstance(values, list):
-            for val in values:
-                self.sql += f"'{val}', "
-            self.sql = self.sql.rstrip(", ")
-            self.sql += ")"
-        else:
+        if not isinstance(values, list):
             raise TypeError(f"Expected a list but found {type(values)}")
-        
-        
-        self.cursor.execute(self.sql)
-        self.my_db.commit()
 
+        sql = self._statement(("insert", table, tuple(columns)), lambda: self._insert_sql(table, columns))
 
-    def read(self, table, clause=None, columns=None, like=False):
-        if not columns:
-            self.sql = f"SELECT * FROM {table}"
-        else:
-            if isinstance(columns, list):
-                self.sql = f"SELECT {', '.join(columns)} FROM {table}"
-            else:
-                raise TypeError(f"Expected a list but found {type(columns)}")
+        with self._cursor() as cursor:
+            self._run(cursor, sql, tuple(values))
+            self._commit(cursor)
 
-        values = []
-        
-        if clause and isinstance(clause, dict):
-            self.sql += " WHERE "
-            conditions = []
-            for key, val in clause.items():
-                if like:  
-                    conditions.append(f"{key} LIKE %s")
-                    values.append(f"%{val}%")
-                else:
-                    conditions.append(f"{key} = %s")
-                    values.append(val)  
-
-            self.sql += " AND ".join(conditions)
-
-        self.cursor.execute(self.sql, tuple(values))
-        results = self.cursor.fetchall()
+
+    def insert_many(self, table, columns, rows):
+        if not isinstance(columns, list):
+            raise TypeError(f"Expected a list but found {type(columns)}")
+        if not rows:
+            return 0
+
+        sql = self._statement(("insert", table, tuple(columns)), lambda: self._insert_sql(table, columns))
+
+        # pymysql folds executemany on a plain INSERT into multi-row statements
+        with self._cursor() as cursor:
+            count = self._run(cursor, sql, [tuple(row) for row in rows], many=True)
+            self._commit(cursor)
+        return count
+
+
+    def _insert_sql(self, table, columns):
+        cols = ", ".join([f"`{self._identifier(col)}`" for col in columns])
+        placeholders = ", ".join(["%s"] * len(columns))
+        return f"INSERT INTO {self._identifier(table)} ({cols}) VALUES ({placeholders})"
+
+
+    def _select(self, table, clause=None, columns=None, like=False, order_by=None, limit=None, offset=None, prefix=()):
+        if columns and not isinstance(columns, list):
+            raise TypeError(f"Expected a list but found {type(columns)}")
+
+        shape, values = self._clause(clause, like, prefix) if clause and isinstance(clause, dict) else ((), [])
+        if limit is not None:
+            values.append(int(limit))
+            if offset:
+                values.append(int(offset))
+
+        key = ("select", table, tuple(columns or ()), shape, order_by, limit is not None, bool(limit is not None and offset))
+
+        def build():
+            selected = ", ".join(self._column(column) for column in columns) if columns else "*"
+            sql = f"SELECT {selected} FROM {self._identifier(table)}"
+            if shape:
+                sql += f" WHERE {self._where(shape)}"
+            if order_by:
+                sql += f" ORDER BY {self._order(order_by)}"
+            if limit is not None:
+                sql += " LIMIT %s"
+                if offset:
+                    sql += " OFFSET %s"
+            return sql
+
+        return self._statement(key, build), tuple(values)
+
+
+    def read(self, table, clause=None, columns=None, like=False, order_by=None, limit=None, offset=None, prefix=()):
+        sql, values = self._select(table, clause, columns, like, order_by, limit, offset, prefix)
+
+        with self._cursor() as cursor:
+            self._run(cursor, sql, values)
+            results = self._rows(cursor, cursor.fetchall())
         return results
 
 
+    def stream(self, table, clause=None, columns=None, order_by=None, chunk_size=1000):
+        # unbuffered server-side cursor: rows arrive chunk by chunk instead of the
+        # whole result set being loaded, the generator must be drained before the
+        # connection is used for anything else
+        sql, values = self._select(table, clause, columns, order_by=order_by)
+
+        fetched = 0
+        with self._cursor(pymysql.cursors.SSCursor) as cursor:
+            self._run(cursor, sql, values)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                fetched += len(rows)
+                yield from self._rows(cursor, rows)
+
+        # the cursor could not say how many rows it would return, so the rows
+        # actually read are added to the statement's stats once it is drained
+        with self._stats_lock:
+            self._statement_stats[self.normalize(sql)][3] += fetched
+
+
     def delete(self, table_name, clause):
-        self.sql = f"DELETE FROM {table_name} WHERE "
-        conditions = []
-        for key, value in clause.items():
-            conditions.append(f"{key}=%s")
-        self.sql += " AND ".join(conditions)
-        self.cursor.execute(self.sql, tuple(clause.values()))
-
-        # Reset and renumber IDs
-        self.cursor.execute(f"SET @count = 0")
-        self.cursor.execute(f"UPDATE {table_name} SET id = @count:= @count + 1")
-        self.cursor.execute(f"ALTER TABLE {table_name} AUTO_INCREMENT = 1")
-        
-        self.my_db.commit()
-    
-    
+        # only the matching rows are touched, ids are never renumbered here
+        shape, values = self._clause(clause)
+        sql = self._statement(
+            ("delete", table_name, shape),
+            lambda: f"DELETE FROM {self._identifier(table_name)} WHERE {self._where(shape)}"
+        )
+
+        with self._cursor() as cursor:
+            rowcount = self._run(cursor, sql, values)
+            self._commit(cursor)
+        return rowcount
+
+
+    def compact_ids(self, table, references=()):
+        # offline maintenance: renumbers ids to 1..n and rewrites the given
+        # (table, column) references, never run it while an election is open
+        table = self._identifier(table)
+        rows = self.query(f"SELECT id FROM {table} ORDER BY id")
+        mapping = [(new_id, old_id) for new_id, (old_id,) in enumerate(rows, start=1) if new_id != old_id]
+        if not mapping:
+            return 0
+
+        # ascending order means a new id is always free by the time it is taken
+        with self.transaction():
+            with self._cursor() as cursor, self._foreign_keys_off(cursor):
+                for child, column in references:
+                    child, column = self._identifier(child), self._identifier(column)
+                    self._run(cursor, f"UPDATE {child} SET {column} = %s WHERE {column} = %s", mapping, many=True)
+                self._run(cursor, f"UPDATE {table} SET id = %s WHERE id = %s", mapping, many=True)
+
+        with self._cursor() as cursor:
+            self._reset_auto_increment(cursor, table)
+            self._commit(cursor)
+        return len(mapping)
+
+
+    # the only MySQL-specific statements the helpers issue, overridden per backend
+    @contextmanager
+    def _foreign_keys_off(self, cursor):
+        self._run(cursor, "SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            yield
+        finally:
+            self._run(cursor, "SET FOREIGN_KEY_CHECKS = 1")
+
+    def _reset_auto_increment(self, cursor, table):
+        # MySQL moves the counter to just past the highest id still in use
+        self._run(cursor, f"ALTER TABLE {table} AUTO_INCREMENT = 1")
+
+
     def delete_all(self, table_name):
-        self.cursor.execute(f"DELETE FROM {table_name}")
-        self.cursor.execute(f"ALTER TABLE {table_name} AUTO_INCREMENT = 1")
-        self.my_db.commit()
+        table_name = self._identifier(table_name)
+        with self._cursor() as cursor:
+            self._run(cursor, f"DELETE FROM {table_name}")
+            self._reset_auto_increment(cursor, table_name)
+            self._commit(cursor)
 
 
     def update(self, table, update, clause):
-        set_clause = ", ".join([f"{key}=%s" for key in update.keys()])
-        where_clause = " AND ".join([f"{key}=%s" for key in clause.keys()])
-        self.sql = f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
-        values = list(update.values()) + list(clause.values())
-        self.cursor.execute(self.sql, values)
-        self.my_db.commit()
+        shape, where_values = self._clause(clause)
+
+        def build():
+            set_clause = ", ".join([f"{self._identifier(key)}=%s" for key in update.keys()])
+            return f"UPDATE {self._identifier(table)} SET {set_clause} WHERE {self._where(shape)}"
+
+        sql = self._statement(("update", table, tuple(update.keys()), shape), build)
+        values = list(update.values()) + where_values
+
+        with self._cursor() as cursor:
+            rowcount = self._run(cursor, sql, values)
+            self._commit(cursor)
+        return rowcount
+
 
+    def count_rows(self, table, clause=None, like=False, prefix=()):
+        sql, values = self._select(table, clause, ["COUNT(*)"], like, prefix=prefix)
 
-    def count_rows(self, table):
-        self.cursor.execute(f"SELECT COUNT(*) FROM {table}")
-        result = self.cursor.fetchone()
+        with self._cursor() as cursor:
+            self._run(cursor, sql, values)
+            result = cursor.fetchone()
         return result[0]
 
-     
+
+    def query(self, sql, values=()):
+        with self._cursor() as cursor:
+            self._run(cursor, sql, tuple(values))
+            results = self._rows(cursor, cursor.fetchall())
+        return results
+
+
+    def execute(self, sql, values=()):
+        with self._cursor() as cursor:
+            rowcount = self._run(cursor, sql, tuple(values))
+            self._commit(cursor)
+        return rowcount
+
+
+    def execute_many(self, sql, rows):
+        if not rows:
+            return 0
+
+        with self._cursor() as cursor:
+            rowcount = self._run(cursor, sql, [tuple(row) for row in rows], many=True)
+            self._commit(cursor)
+        return rowcount
+
+
+    def indexes(self):
+        # table -> [(columns, unique), ...] for every index in the current schema
+        rows = self.query("""
+            SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """)
+
+        found = {}
+        for table, name, non_unique, column in rows:
+            found.setdefault((table, name), (not non_unique, []))[1].append(column)
+
+        indexes = {}
+        for (table, _), (unique, columns) in found.items():
+            indexes.setdefault(table, []).append((tuple(columns), unique))
+        return indexes
+
+
+    def statement_stats(self):
+        with self._stats_lock:
+            stats = [
+                {
+                    "sql": sql,
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total / calls * 1000, 3),
+                    "max_ms": round(longest * 1000, 3),
+                    "rows": rows,
+                }
+                for sql, (calls, total, longest, rows) in self._statement_stats.items()
+            ]
+        return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+
     def close(self):
-        self.my_db.close()
+        self.pool.close()
+
 
-                
 if __name__ == "__main__":
-    db = Database("localhost", "root", "", "voting_db")
\ No newline at end of file
+    db = Database("localhost", "root", "", "voting_db")
@@ -0,0 +1,154 @@
+"""Versioned schema migrations.
+
+Each migration is applied once, in order, and recorded in schema_migrations.
+MySQL commits DDL implicitly, so every step is written to be safe to re-run
+if a migration stops halfway.
+
+    flask --app main migrate
+"""
+
+# every lookup on a hot path; a lookup counts as indexed when some index
+# starts with these columns (or, for unique ones, is exactly that unique key)
+EXPECTED_INDEXES = [
+    # name, table, columns, unique
+    ("uq_voting_codes_code", "voting_codes", ("code",), True),
+    ("idx_voting_codes_has_voted", "voting_codes", ("has_voted",), False),
+    ("idx_candidates_position", "candidates", ("position_id",), False),
+    ("idx_votes_candidate_position", "votes", ("candidate_id", "position_id"), False),
+    ("idx_votes_position", "votes", ("position_id",), False),
+    ("idx_votes_voting_code", "votes", ("voting_code_id",), False),
+    ("idx_final_results_session", "final_results", ("session_id",), False),
+    ("idx_election_sessions_active", "election_sessions", ("active",), False),
+    ("idx_election_sessions_name", "election_sessions", ("name",), False),
+]
+
+SCHEMA_MIGRATIONS = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+INITIAL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS admin (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS positions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS candidates (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        full_name VARCHAR(100) NOT NULL,
+        class_name VARCHAR(50),
+        gender VARCHAR(10),
+        photo_url VARCHAR(255),
+        position_id INT NOT NULL,
+        total_votes INT NOT NULL DEFAULT 0,
+        FOREIGN KEY (position_id) REFERENCES positions(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS voting_codes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        code VARCHAR(50) UNIQUE NOT NULL,
+        has_voted VARCHAR(3) NOT NULL DEFAULT 'No',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS votes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        voting_code_id INT NOT NULL,
+        candidate_id INT NOT NULL,
+        position_id INT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (voting_code_id) REFERENCES voting_codes(id),
+        FOREIGN KEY (candidate_id) REFERENCES candidates(id),
+        FOREIGN KEY (position_id) REFERENCES positions(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS election_sessions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        active BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS final_results (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        session_id INT NOT NULL,
+        candidate_id INT NOT NULL,
+        position_id INT NOT NULL,
+        total_votes INT NOT NULL,
+        `rank` INT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES election_sessions(id) ON DELETE CASCADE,
+        FOREIGN KEY (candidate_id) REFERENCES candidates(id) ON DELETE CASCADE,
+        FOREIGN KEY (position_id) REFERENCES positions(id) ON DELETE CASCADE
+    )
+    """,
+]
+
+
+def create_indexes(db):
+    for name, table, columns, unique in missing_indexes(db):
+        db.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})")
+
+
+MIGRATIONS = [
+    (1, "initial schema", INITIAL_SCHEMA),
+    (2, "index hot lookup columns", [
+        # TEXT can only be indexed by prefix, and the column only ever holds Yes/No
+        "ALTER TABLE voting_codes MODIFY has_voted VARCHAR(3) NOT NULL DEFAULT 'No'",
+        create_indexes,
+    ]),
+]
+
+
+def current_version(db):
+    db.execute(SCHEMA_MIGRATIONS)
+    rows = db.query("SELECT MAX(version) FROM schema_migrations")
+    return rows[0][0] or 0
+
+
+def migrate(db, target=None):
+    version = current_version(db)
+    applied = []
+
+    for number, name, steps in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+
+        for step in steps:
+            if callable(step):
+                step(db)
+            else:
+                db.execute(step)
+
+        db.insert("schema_migrations", ["version", "name"], [number, name])
+        applied.append((number, name))
+    return applied
+
+
+def missing_indexes(db):
+    indexes = db.indexes()
+    missing = []
+    for name, table, columns, unique in EXPECTED_INDEXES:
+        if unique:
+            covered = (columns, True) in indexes.get(table, [])
+        else:
+            covered = any(found[:len(columns)] == columns for found, _ in indexes.get(table, []))
+        if not covered:
+            missing.append((name, table, columns, unique))
+    return missing
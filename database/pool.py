@@ -0,0 +1,204 @@
+import threading
+import time
+import weakref
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=10, timeout=30, ping_interval=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._idle = deque()
+        self._lock = threading.Condition()
+        self._created = 0
+        self._closed = False
+
+        # metrics
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.reconnects = 0
+        self.checkout_time = 0.0
+        self.max_checkout_time = 0.0
+
+    def acquire(self):
+        started = time.perf_counter()
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    conn, last_used = None, None
+                    break
+
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - started)
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._lock.wait(remaining)
+
+            self.in_use += 1
+
+        try:
+            if conn is None:
+                conn = self.connect()
+            elif time.monotonic() - last_used > self.ping_interval:
+                conn = self._check(conn)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+                self.in_use -= 1
+                self._lock.notify()
+            raise
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.checkout_time += elapsed
+            self.max_checkout_time = max(self.max_checkout_time, elapsed)
+
+        return conn
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._lock:
+            self.in_use -= 1
+            if discard or self._closed:
+                self._created -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def _check(self, conn):
+        # ping(reconnect=True) transparently reopens a link the server dropped
+        try:
+            conn.ping(reconnect=True)
+            return conn
+        except Exception:
+            self._close_quietly(conn)
+            with self._lock:
+                self.reconnects += 1
+            return self.connect()
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "reconnects": self.reconnects,
+                "avg_checkout_ms": round(self.checkout_time / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_checkout_ms": round(self.max_checkout_time * 1000, 3),
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._created -= 1
+                self._close_quietly(conn)
+            self._lock.notify_all()
+
+
+class ThreadLocalPool(ConnectionPool):
+    # one connection per thread, opened on first use and kept for the life of
+    # the thread, for embedded databases where connecting costs nothing and a
+    # connection is best never shared; nested checkouts on a thread get the
+    # same connection, and it is only rolled back when the outermost is released
+    def __init__(self, connect):
+        super().__init__(connect, size=0)
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+
+    def acquire(self):
+        local = self._local
+        with self._lock:
+            if self._closed:
+                raise PoolTimeout("Connection pool is closed")
+            self.in_use += 1
+            self.checkouts += 1
+
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            try:
+                conn = self.connect()
+            except Exception:
+                with self._lock:
+                    self.in_use -= 1
+                raise
+            local.conn, local.depth = conn, 0
+            with self._lock:
+                self._connections.add(conn)
+        local.depth += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        local = self._local
+        local.depth -= 1
+        if not discard and local.depth == 0:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        close = discard or (self._closed and local.depth == 0)
+        with self._lock:
+            self.in_use -= 1
+            if close:
+                self._connections.discard(conn)
+        if close:
+            local.conn, local.depth = None, 0
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            open_connections = len(self._connections)
+            return {
+                "size": open_connections,
+                "open": open_connections,
+                "idle": max(open_connections - self.in_use, 0),
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "waits": 0,
+                "reconnects": 0,
+                "avg_checkout_ms": 0.0,
+                "max_checkout_ms": 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            self._close_quietly(conn)
@@ -0,0 +1,52 @@
+# Hand-written statements for the hot paths that the generic
+# insert/read/update helpers in db.py cannot express in one round trip.
+
+DASHBOARD_STATS = """
+    SELECT
+        (SELECT COUNT(*) FROM candidates),
+        (SELECT COUNT(*) FROM positions),
+        (SELECT COUNT(*) FROM voting_codes),
+        (SELECT COUNT(*) FROM voting_codes WHERE has_voted = 'Yes'),
+        EXISTS (SELECT 1 FROM election_sessions WHERE active = 1)
+"""
+
+# Ranks every candidate within their position by the votes actually recorded
+# in the votes table (not the running total_votes counter). Ties are broken
+# explicitly in favour of the candidate registered first (lowest id), so
+# each position always has exactly one rank 1 and one rank 2.
+CLOSE_ELECTION = """
+    INSERT INTO final_results (session_id, candidate_id, position_id, total_votes, `rank`)
+    SELECT
+        %s,
+        c.id,
+        c.position_id,
+        COALESCE(v.votes, 0),
+        ROW_NUMBER() OVER (PARTITION BY c.position_id ORDER BY COALESCE(v.votes, 0) DESC, c.id ASC)
+    FROM candidates c
+    LEFT JOIN (
+        SELECT candidate_id, COUNT(*) AS votes FROM votes GROUP BY candidate_id
+    ) v ON v.candidate_id = c.id
+"""
+
+FINAL_RESULTS = """
+    SELECT c.full_name, c.class_name, c.gender, c.photo_url, p.name AS position_name, fr.total_votes, fr.`rank`
+    FROM final_results fr
+    JOIN candidates c ON c.id = fr.candidate_id
+    JOIN positions p ON p.id = fr.position_id
+    WHERE fr.session_id = %s
+    ORDER BY p.id, fr.`rank`
+"""
+
+# Per-candidate counts straight from the votes table, what the in-memory
+# tally is rebuilt from at startup and reconciled against.
+VOTE_COUNTS = """
+    SELECT candidate_id, COUNT(*) FROM votes GROUP BY candidate_id
+"""
+
+ADD_TOTAL_VOTES = """
+    UPDATE candidates SET total_votes = total_votes + %s WHERE id = %s
+"""
+
+SYNC_TOTAL_VOTES = """
+    UPDATE candidates SET total_votes = (SELECT COUNT(*) FROM votes WHERE votes.candidate_id = candidates.id)
+"""
@@ -1,3 +1,6 @@
+-- Reference copy of the schema after every migration in database/migrations.py;
+-- prefer `flask --app main migrate`, which also upgrades an existing database.
+
 -- Admins Table
 CREATE TABLE admin (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -8,7 +11,7 @@ CREATE TABLE admin (
 -- Positions Table
 CREATE TABLE positions (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(100) NOT NULL,
+    name VARCHAR(100) NOT NULL
 );
 
 -- Candidates Table
@@ -20,15 +23,18 @@ CREATE TABLE candidates (
     photo_url VARCHAR(255),
     position_id INT NOT NULL,
     total_votes INT NOT NULL DEFAULT 0,
-    FOREIGN KEY (position_id) REFERENCES positions(id)
+    FOREIGN KEY (position_id) REFERENCES positions(id),
+    INDEX idx_candidates_position (position_id)
 );
 
 -- Voting Codes Table
 CREATE TABLE voting_codes (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    code VARCHAR(50) UNIQUE NOT NULL,
-    has_voted TEXT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    code VARCHAR(50) NOT NULL,
+    has_voted VARCHAR(3) NOT NULL DEFAULT 'No',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE INDEX uq_voting_codes_code (code),
+    INDEX idx_voting_codes_has_voted (has_voted)
 );
 
 -- Votes Table
@@ -40,7 +46,10 @@ CREATE TABLE votes (
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (voting_code_id) REFERENCES voting_codes(id),
     FOREIGN KEY (candidate_id) REFERENCES candidates(id),
-    FOREIGN KEY (position_id) REFERENCES positions(id)
+    FOREIGN KEY (position_id) REFERENCES positions(id),
+    INDEX idx_votes_candidate_position (candidate_id, position_id),
+    INDEX idx_votes_position (position_id),
+    INDEX idx_votes_voting_code (voting_code_id)
 );
 
 -- Election Sessions Table
@@ -48,7 +57,9 @@ CREATE TABLE election_sessions (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     active BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_election_sessions_active (active),
+    INDEX idx_election_sessions_name (name)
 );
 
 -- Election Final Results
@@ -58,10 +69,11 @@ CREATE TABLE final_results (
     candidate_id INT NOT NULL,
     position_id INT NOT NULL,
     total_votes INT NOT NULL,
-    rank INT NOT NULL,
+    `rank` INT NOT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
 
     FOREIGN KEY (session_id) REFERENCES election_sessions(id) ON DELETE CASCADE,
     FOREIGN KEY (candidate_id) REFERENCES candidates(id) ON DELETE CASCADE,
-    FOREIGN KEY (position_id) REFERENCES positions(id) ON DELETE CASCADE
+    FOREIGN KEY (position_id) REFERENCES positions(id) ON DELETE CASCADE,
+    INDEX idx_final_results_session (session_id)
 );
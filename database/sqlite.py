@@ -0,0 +1,191 @@
+"""Embedded SQLite backend behind the same interface as database.db.Database.
+
+For a single laptop running a polling station without a MySQL server: the
+database is one file next to the app, every query is a function call instead
+of a round trip, and a new file is created with the full schema on startup.
+
+    DB_BACKEND=sqlite SQLITE_PATH=voting.db python serve.py
+
+The hand-written statements and the generated ones keep their MySQL form
+(%s placeholders, backticks) and are translated here, so the rest of the app
+does not know which backend it runs on.
+"""
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pymysql.err import IntegrityError
+from database.db import Database, STATEMENT_CACHE_SIZE
+from database.pool import ThreadLocalPool
+from database import migrations
+
+# WAL lets readers (results, dashboard) run while a ballot is being written;
+# writers still take turns, waiting up to busy_timeout for the lock
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 134217728",
+]
+
+PLACEHOLDER = re.compile(r"%s")
+AUTO_INCREMENT_KEY = re.compile(r"\bINT AUTO_INCREMENT PRIMARY KEY\b", re.IGNORECASE)
+
+# stored the way MySQL returns a DATETIME column
+sqlite3.register_adapter(datetime, lambda value: value.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def translate(sql):
+    return AUTO_INCREMENT_KEY.sub("INTEGER PRIMARY KEY AUTOINCREMENT", PLACEHOLDER.sub("?", sql))
+
+
+def integrity_error(sql, error):
+    # the MySQL error codes the views check for: 1451 when a row is still
+    # referenced, 1452 for a missing parent, 1062 for a duplicate
+    message = str(error)
+    if "FOREIGN KEY" in message:
+        code = 1452 if sql.lstrip().upper().startswith("INSERT") else 1451
+    elif "UNIQUE" in message or "PRIMARY KEY" in message:
+        code = 1062
+    elif "NOT NULL" in message:
+        code = 1048
+    else:
+        code = 0
+    return IntegrityError(code, message)
+
+
+class Cursor:
+    # the parts of a pymysql cursor db.py relies on: execute returns the
+    # rowcount and the cursor is a context manager
+    def __init__(self, connection, translated):
+        self.connection = connection
+        self._translated = translated
+        self._cursor = connection.raw.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _sql(self, sql):
+        translated = self._translated.get(sql)
+        if translated is None:
+            if len(self._translated) >= STATEMENT_CACHE_SIZE:
+                self._translated.clear()
+            translated = self._translated[sql] = translate(sql)
+        return translated
+
+    def execute(self, sql, values=()):
+        try:
+            self._cursor.execute(self._sql(sql), tuple(values))
+        except sqlite3.IntegrityError as e:
+            raise integrity_error(sql, e) from e
+        return self._cursor.rowcount
+
+    def executemany(self, sql, rows):
+        try:
+            self._cursor.executemany(self._sql(sql), rows)
+        except sqlite3.IntegrityError as e:
+            raise integrity_error(sql, e) from e
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class Connection:
+    def __init__(self, raw, translated):
+        self.raw = raw
+        self._translated = translated
+
+    def cursor(self, cursor_class=None):
+        # sqlite cursors already step through rows lazily, so stream() needs no
+        # special cursor class
+        return Cursor(self, self._translated)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteDatabase(Database):
+    # "database is locked" once busy_timeout runs out
+    UNAVAILABLE = Database.UNAVAILABLE + (sqlite3.OperationalError,)
+
+    def __init__(self, path, timeout=30):
+        super().__init__(None, None, None, path)
+        self.path = path
+        self.timeout = timeout
+        self.pool = ThreadLocalPool(self._connect)
+        self._translated = {}
+
+    def _connect(self):
+        # IMMEDIATE: a write transaction takes the write lock at its first
+        # statement, so two ballots queue on busy_timeout instead of one
+        # failing with "database is locked" halfway through
+        raw = sqlite3.connect(self.path, timeout=self.timeout, isolation_level="IMMEDIATE", check_same_thread=False)
+        for pragma in PRAGMAS:
+            raw.execute(pragma)
+        return Connection(raw, self._translated)
+
+    def bootstrap(self):
+        # a new file gets the current schema and indexes in one go and is
+        # recorded as fully migrated; an existing one is left to `migrate`
+        if migrations.current_version(self):
+            return False
+
+        for statement in migrations.INITIAL_SCHEMA:
+            self.execute(statement)
+        migrations.create_indexes(self)
+        with self.transaction():
+            for number, name, _ in migrations.MIGRATIONS:
+                self.insert("schema_migrations", ["version", "name"], [number, name])
+        return True
+
+    @contextmanager
+    def _foreign_keys_off(self, cursor):
+        # foreign_keys cannot be switched inside a transaction; deferring the
+        # checks to the commit does the same and resets itself afterwards
+        self._run(cursor, "PRAGMA defer_foreign_keys = ON")
+        yield
+
+    def _reset_auto_increment(self, cursor, table):
+        self._run(
+            cursor,
+            f"UPDATE sqlite_sequence SET seq = (SELECT COALESCE(MAX(id), 0) FROM {table}) WHERE name = %s",
+            (table,)
+        )
+
+    def indexes(self):
+        indexes = {}
+        tables = self.query("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        for (table,) in tables:
+            for index in self.query(f"PRAGMA index_list({self._identifier(table)})"):
+                columns = self.query(f"PRAGMA index_info({self._identifier(index.name)})")
+                indexes.setdefault(table, []).append((tuple(column.name for column in columns), bool(index.unique)))
+        return indexes
@@ -0,0 +1,112 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, name, key=None, url=None, label=None):
+        self.id = secrets.token_hex(8)
+        self.name = name
+        self.key = key
+        self.url = url          # where the admin goes once the job is done
+        self.label = label
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.message = None
+        self.category = "info"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def progress(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def finish(self, message, category="success"):
+        self.message = message
+        self.category = category
+
+    def duration(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "message": self.message,
+            "category": self.category,
+            "url": self.url,
+            "label": self.label,
+            "duration": round(self.duration(), 3)
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers=1, keep=100, context=None, logger=None):
+        self.max_workers = max_workers
+        self.keep = keep
+        self.context = context
+        self.logger = logger
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self, name, fn, *args, key=None, url=None, label=None):
+        # one active job per key, a double-submitted form gets the running job back
+        with self._lock:
+            if key is not None:
+                for job in self._jobs.values():
+                    if job.key == key and job.active:
+                        return job
+
+            job = Job(name, key, url, label)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.active:
+                    break
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            if self.context is not None:
+                with self.context():
+                    fn(job, *args)
+            else:
+                fn(job, *args)
+            job.status = "done"
+        except Exception:
+            if self.logger is not None:
+                self.logger.exception("Job %s (%s) failed", job.id, job.name)
+            job.status = "failed"
+            job.finish("Something went wrong, please try again.", "danger")
+        finally:
+            job.finished_at = time.time()
+            if self.logger is not None:
+                self.logger.info("Job %s (%s) %s in %.2fs", job.id, job.name, job.status, job.duration())
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,329 @@
+"""Write-ahead journal for ballots, so voting carries on while the database stalls.
+
+A ballot is acknowledged once its line is fsynced; ballots arriving while a
+sync is in progress are written and synced together with the next one. A
+drainer thread then applies them to the database in order, retrying through
+outages, and the file is emptied whenever everything in it has been applied.
+Whatever is left after a crash is applied again on start, so apply() must be
+idempotent and raise AlreadyApplied for a ballot the database already has.
+Only the errors given as transient (the database is unreachable) are
+retried; a ballot failing any other way is logged and set aside, so it
+cannot hold up the ones behind it.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class JournalClosed(Exception):
+    pass
+
+
+class AlreadyApplied(Exception):
+    pass
+
+
+class BallotJournal:
+    def __init__(self, path, apply, used=None, transient=(ConnectionError,), retry_interval=1, sync_timeout=30,
+                 logger=None):
+        self.path = path
+        self.apply = apply              # entry -> True if applied, False if rejected
+        self.used = used                # -> codes the database already has a ballot for
+        self.transient = transient
+        self.retry_interval = retry_interval
+        self.sync_timeout = sync_timeout
+        self.logger = logger
+
+        self._lock = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._writing = []              # tickets waiting for the next sync
+        self._syncing = False
+        self._pending = deque()         # synced entries not yet applied
+        self._codes = set()             # used codes and every code accepted since start
+        self._used_loaded = False       # the used codes are in _codes
+        self._threads = []
+        self._started = False
+        self._stopping = False
+        self._stopped = threading.Event()
+
+        # metrics
+        self.accepted = 0
+        self.syncs = 0
+        self.sync_errors = 0
+        self.applied = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.apply_errors = 0
+        self.replayed = 0
+        self.last_error = None
+
+    def start(self):
+        if self._started:
+            return False
+
+        with self._start_lock:
+            if self._started:
+                return False
+            entries = self._replay()
+            self._file = open(self.path, "ab")
+            with self._lock:
+                self._pending.extend(entries)
+                self._codes.update(entry["code"] for entry in entries)
+            # while the database is down ballots are still journaled; the
+            # drainer loads the used codes once it is back
+            self._used_loaded = self._load_used()
+
+            for name, target in (("journal-writer", self._write_loop), ("journal-drainer", self._drain_loop)):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.stop)
+            self._started = True
+            return True
+
+    def _replay(self):
+        # everything still in the file was acknowledged but may not have been
+        # applied; a line cut short by a crash was never acknowledged
+        entries = []
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        if self.logger is not None:
+                            self.logger.warning("Skipping unreadable ballot journal line: %r", line[:200])
+        except FileNotFoundError:
+            return entries
+
+        # rewritten without the torn line, so new entries start on a clean one
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            for entry in entries:
+                f.write(self._encode(entry))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+        self.replayed = len(entries)
+        if entries and self.logger is not None:
+            self.logger.warning("Replaying %d ballot(s) from %s", len(entries), self.path)
+        return entries
+
+    def _encode(self, entry):
+        return (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+
+    def seen(self, code):
+        # accepted in this process, whether or not it has reached the database
+        self.start()
+        with self._lock:
+            return code in self._codes
+
+    def _load_used(self, quiet=False):
+        if self.used is None:
+            return True
+        try:
+            used = set(self.used())
+        except Exception as e:
+            if not quiet and self.logger is not None:
+                self.logger.warning("Could not load the used voting codes, retrying in the background: %s", e)
+            return False
+        with self._lock:
+            self._codes.update(used)
+        return True
+
+    def reload_codes(self):
+        # after the codes were replaced (a reset), so a new code that happens
+        # to match an old one is not refused
+        with self._lock:
+            in_flight = [ticket["entry"] for ticket in self._writing] + list(self._pending)
+            self._codes = {entry["code"] for entry in in_flight}
+            self._used_loaded = False
+        self._used_loaded = self._load_used()
+
+    def submit(self, entry):
+        # queues the ballot for the next sync and returns a ticket for wait(),
+        # or None when its code already has one
+        self.start()
+        ticket = {"entry": entry, "synced": False, "error": None}
+        with self._lock:
+            if self._stopping:
+                raise JournalClosed("Ballot journal is closed")
+            if entry["code"] in self._codes:
+                return None
+            self._codes.add(entry["code"])
+            self._writing.append(ticket)
+            self._lock.notify_all()
+        return ticket
+
+    def wait(self, ticket):
+        # blocks until the ballot is on disk, at most sync_timeout seconds
+        deadline = time.monotonic() + self.sync_timeout
+        with self._lock:
+            while not ticket["synced"] and ticket["error"] is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if ticket in self._writing:
+                        # never written, so the voter can submit it again
+                        self._writing.remove(ticket)
+                        self._codes.discard(ticket["entry"]["code"])
+                    raise TimeoutError(f"Ballot journal did not sync within {self.sync_timeout}s")
+                self._lock.wait(remaining)
+        if ticket["error"] is not None:
+            raise ticket["error"]
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while not self._writing and not self._stopping:
+                    self._lock.wait()
+                if not self._writing:
+                    return
+                batch, self._writing = self._writing, []
+                self._syncing = True
+
+            # anything going wrong fails the whole batch: the thread must live
+            # on, or every voter waiting on it would hang
+            error = None
+            offset = None
+            try:
+                offset = os.fstat(self._file.fileno()).st_size
+                self._file.write(b"".join(self._encode(ticket["entry"]) for ticket in batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception as e:
+                error = e
+                # a half-written batch would run into the next one's first line
+                try:
+                    if offset is not None:
+                        self._file.truncate(offset)
+                except (OSError, ValueError):
+                    pass
+                if self.logger is not None:
+                    self.logger.exception("Could not write %d ballot(s) to the journal", len(batch))
+
+            with self._lock:
+                for ticket in batch:
+                    if error is None:
+                        ticket["synced"] = True
+                        self._pending.append(ticket["entry"])
+                    else:
+                        ticket["error"] = error
+                        self._codes.discard(ticket["entry"]["code"])
+                self.syncs += 1
+                self.sync_errors += error is not None
+                self.accepted += len(batch) if error is None else 0
+                self._syncing = False
+                self._lock.notify_all()
+
+    def _drain_loop(self):
+        while True:
+            if not self._used_loaded:
+                self._used_loaded = self._load_used(quiet=True)
+
+            with self._lock:
+                while not self._pending and not self._stopping:
+                    if not self._used_loaded:
+                        # wake up to try loading the used codes again
+                        self._lock.wait(self.retry_interval)
+                        break
+                    self._lock.wait()
+                if not self._pending:
+                    if self._stopping:
+                        return
+                    continue
+                entry = self._pending[0]
+
+            try:
+                applied = self.apply(entry)
+            except AlreadyApplied:
+                # replayed after a crash that came before the truncation
+                applied = None
+            except self.transient as e:
+                # the database is down or stalled: keep the order, try again
+                with self._lock:
+                    first = self.last_error is None
+                    self.apply_errors += 1
+                    self.last_error = str(e)
+                if first and self.logger is not None:
+                    self.logger.warning("Ballot journal cannot reach the database, retrying: %s", e)
+                if self._stopped.wait(self.retry_interval):
+                    return
+                continue
+            except Exception:
+                # the entry itself is at fault, retrying would block every
+                # later ballot behind it; the log keeps it for a manual fix
+                if self.logger is not None:
+                    self.logger.exception("Ballot journal could not apply, setting it aside: %s", json.dumps(entry))
+                applied = False
+
+            with self._lock:
+                self._pending.popleft()
+                if applied is None:
+                    self.duplicates += 1
+                elif applied:
+                    self.applied += 1
+                else:
+                    self.rejected += 1
+                if self.last_error is not None and self.logger is not None:
+                    self.logger.warning("Ballot journal reached the database again")
+                self.last_error = None
+                if not self._pending and not self._writing and not self._syncing:
+                    self._truncate()
+                self._lock.notify_all()
+
+    def _truncate(self):
+        # called with the lock held and nothing in flight; if the truncation
+        # is lost to a crash the applied ballots are replayed, harmlessly
+        try:
+            self._file.truncate(0)
+        except (OSError, ValueError):
+            if self.logger is not None:
+                self.logger.exception("Could not truncate the ballot journal")
+
+    def drain(self, timeout=30):
+        # waits until every accepted ballot is in the database
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._pending or self._writing or self._syncing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "pending": len(self._pending) + len(self._writing),
+                "applied": self.applied,
+                "rejected": self.rejected,
+                "duplicates": self.duplicates,
+                "syncs": self.syncs,
+                "ballots_per_sync": round(self.accepted / self.syncs, 2) if self.syncs else 0.0,
+                "sync_errors": self.sync_errors,
+                "apply_errors": self.apply_errors,
+                "replayed": self.replayed,
+                "last_error": self.last_error,
+            }
+
+    def stop(self, timeout=10):
+        # waiting ballots are still written; those the database has not taken
+        # by the timeout stay in the file for the next start
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._stopped.set()
+            self._lock.notify_all()
+
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._file is not None:
+            self._file.close()
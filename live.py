@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from collections import defaultdict
+
+
+class LiveResults:
+    def __init__(self, load, tally, max_rate=2, refresh_interval=5, max_streams=4, max_age=300):
+        if max_rate < 0:
+            raise ValueError("max_rate must be 0 (no throttle) or a number of pushes per second")
+        self.load = load
+        self.tally = tally
+        self.max_rate = max_rate
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age      # seconds before a stream ends and the browser reconnects
+
+        # every open stream holds one of the server's worker threads, so only a
+        # few may be open at once; the rest of the results screens poll instead
+        self._slots = threading.BoundedSemaphore(max_streams) if max_streams else None
+        self.streams = 0
+
+        self._cond = threading.Condition()
+        self._load_lock = threading.Lock()
+        self._positions = None      # position id -> name, in ballot order
+        self._candidates = {}       # candidate id -> (full_name, position_id)
+        self._version = 0
+        self._layout = 0            # bumped whenever positions or candidates change
+        self._loaded_at = 0.0
+
+        # vote counts live in the tally, which tells us whenever they move
+        tally.subscribe(self.changed)
+
+    def _stale(self):
+        return self._positions is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def _refresh(self):
+        # only the layout is loaded here, the periodic reload catches admin
+        # edits made elsewhere (other workers, the database directly)
+        if not self._stale():
+            return
+
+        with self._load_lock:
+            if not self._stale():
+                return
+
+            positions, candidates = self.load()
+            position_map = {p[0]: p[1] for p in positions}
+            candidate_map = {c[0]: (c[1], c[2]) for c in candidates}
+
+            with self._cond:
+                if position_map != self._positions or candidate_map != self._candidates:
+                    if self._positions is not None:
+                        self._layout += 1
+                    self._version += 1
+                    self._cond.notify_all()
+
+                self._positions, self._candidates = position_map, candidate_map
+                self._loaded_at = time.monotonic()
+
+    def changed(self):
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def invalidate(self):
+        with self._cond:
+            self._loaded_at = 0.0
+            self._cond.notify_all()
+
+    def _results(self, totals):
+        per_position = defaultdict(list)
+        for candidate_id, (_, position_id) in self._candidates.items():
+            per_position[position_id].append(candidate_id)
+
+        results_data = []
+        for position_id, position_name in self._positions.items():
+            candidate_ids = per_position.get(position_id)
+            if not candidate_ids:
+                continue
+
+            position_total = sum(totals.get(c, 0) for c in candidate_ids) or 1
+            candidates = []
+            for candidate_id in candidate_ids:
+                total_votes = totals.get(candidate_id, 0)
+                candidates.append({
+                    "id": candidate_id,
+                    "full_name": self._candidates[candidate_id][0],
+                    "position_id": position_id,
+                    "position_name": position_name,
+                    "total_votes": total_votes,
+                    "percentage": round((total_votes / position_total) * 100)
+                })
+
+            results_data.append({
+                "position": {
+                    "id": position_id,
+                    "name": position_name
+                },
+                "candidates": candidates
+            })
+        return results_data
+
+    def snapshot(self):
+        self._refresh()
+        totals = self.tally.counts()
+        with self._cond:
+            return {
+                "version": self._version,
+                "total_positions": len(self._positions),
+                "total_candidates": len(self._candidates),
+                "results": self._results(totals)
+            }
+
+    def open_stream(self):
+        # False when every slot is taken; close_stream() once the response ends
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            return False
+        with self._cond:
+            self.streams += 1
+        return True
+
+    def close_stream(self):
+        with self._cond:
+            self.streams -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def stream(self, heartbeat=15, retry=3000):
+        # how long the browser waits before reconnecting once the stream ends
+        yield f"retry: {retry}\n\n"
+
+        self._refresh()
+        with self._cond:
+            layout = self._layout
+
+        deadline = time.monotonic() + self.max_age if self.max_age else None
+        sent = {}
+        seen = None
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                # give the worker thread back; the reconnect starts a fresh
+                # stream, which sends every count again
+                return
+
+            with self._cond:
+                if self._version == seen and self._loaded_at:
+                    self._cond.wait(min(heartbeat, self.refresh_interval))
+
+            self._refresh()
+            totals = self.tally.counts()
+            with self._cond:
+                reset = self._layout != layout
+                idle = self._version == seen
+                seen = self._version
+                results_data = None if reset or idle else self._results(totals)
+
+            # never yield while holding the lock, the client may be slow to read
+            if reset:
+                # a candidate or position was added/removed, the page must re-render
+                yield "event: reset\ndata: {}\n\n"
+                return
+            if idle:
+                yield ": keep-alive\n\n"
+                continue
+
+            # only positions with a changed count are pushed, with every sibling
+            # candidate since their percentages move together
+            changes = {}
+            for item in results_data:
+                if any(sent.get(c["id"]) != c["total_votes"] for c in item["candidates"]):
+                    for c in item["candidates"]:
+                        sent[c["id"]] = c["total_votes"]
+                        changes[c["id"]] = [c["total_votes"], c["percentage"]]
+
+            if changes:
+                yield f"event: delta\ndata: {json.dumps({'version': seen, 'candidates': changes})}\n\n"
+
+            # coalesce bursts: ballots landing while we sleep go out in the next push
+            if self.max_rate:
+                time.sleep(1 / self.max_rate)
@@ -1,20 +1,31 @@
 import os
-import random, string
+import click
+import hashlib, glob, json, secrets, string, threading, time
 from datetime import datetime
+from contextlib import contextmanager
 from functools import wraps
 from database.db import Database
+from database.sqlite import SQLiteDatabase
+from database import queries, migrations
 from flask.views import MethodView
-from flask import Flask, render_template, redirect, url_for, flash, session, request, send_from_directory
+from flask import Flask, render_template, redirect, url_for, flash, session, request, send_file, jsonify, Response
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
 from flask_bootstrap import Bootstrap5
 from wtforms import StringField, SubmitField, SelectField, PasswordField
 from wtforms.validators import DataRequired, Length
 from werkzeug.security import check_password_hash
-from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
 from pdf import PDFGenerator, ResultPDFGenerator
+from live import LiveResults
+from tally import Tally
+from cache import BallotCache, ResultsCache
+from jobs import JobQueue
+from journal import BallotJournal, AlreadyApplied
+from profiling import QueryProfiler
+from photos import PhotoStore, InvalidPhoto, is_hashed
+from assets import Assets
 from collections import defaultdict
 from pymysql.err import IntegrityError
 
@@ -24,12 +35,55 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY")
 Bootstrap5(app)
 
+# fingerprinted, precompressed static files (python build_assets.py) and
+# ETag + gzip for rendered pages; first, so its after_request hook runs last
+assets = Assets(app.static_folder)
+assets.init_app(app)
 
-db = Database("localhost", "root", "", "voting_db")
+
+# MySQL by default; DB_BACKEND=sqlite keeps everything in one local file
+if os.environ.get("DB_BACKEND") == "sqlite":
+    db = SQLiteDatabase(os.environ.get("SQLITE_PATH", "voting.db"))
+    db.bootstrap()
+else:
+    # without DB_POOL_SIZE, warm_up() sizes the pool to the request threads
+    db = Database("localhost", "root", "", "voting_db", pool_size=int(os.environ.get("DB_POOL_SIZE") or 10))
+db.init_app(app)
+
+profiler = QueryProfiler(
+    slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", 200)),
+    toolbar=os.environ.get("PROFILE_TOOLBAR") == "1"
+)
+profiler.init_app(app, db)
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_CHUNK_SIZE = 1000
+CODE_STATUS_FILTERS = {"used": "Yes", "unused": "No"}
+
+CODES_FOLDER = os.path.join("static", "codes")
+codes_pdf_lock = threading.Lock()
+RESULTS_FOLDER = os.path.join("static", "results")
+results_pdf_lock = threading.Lock()
 
 DEFAULT_PHOTO = "default.jpg"
 UPLOAD_FOLDER = os.path.join("static", "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
+
+# uploads are re-encoded into content-hashed thumbnails, see photos.py
+photos = PhotoStore(app.static_folder)
+app.add_template_filter(photos.thumbnail, "thumb")
+
+
+@app.after_request
+def cache_photos(response):
+    # a content-hashed name changes whenever the image does
+    if request.endpoint == "static" and is_hashed(request.path):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
 
 
 class CandidateForm(FlaskForm):
@@ -47,6 +101,10 @@ class ChangePasswordForm(FlaskForm):
     submit = SubmitField("Update")
 
 
+class CodeAlreadyUsed(Exception):
+    pass
+
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -68,15 +126,298 @@ def voter_required(f):
 
 
 def generate_codes(length=10):
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+    return ''.join(secrets.choice(CODE_ALPHABET) for _ in range(length))
 
 
 def vote_quantity(count):
-    codes = []
-    for _ in range(count):
-        code = generate_codes()
-        codes.append(code)
-    return codes
+    # a set guarantees the batch is collision-free before it reaches the unique index
+    codes = set()
+    while len(codes) < count:
+        codes.add(generate_codes())
+    return list(codes)
+
+
+def codes_pdf_path():
+    # the file name is derived from the code set, so it only changes (and the
+    # PDF is only rebuilt) when codes are generated or reset
+    count, max_id, first, last = db.read("voting_codes", columns=["COUNT(*)", "MAX(id)", "MIN(code)", "MAX(code)"])[0]
+    if not count:
+        return None
+    digest = hashlib.sha1(f"{count}:{max_id}:{first}:{last}".encode()).hexdigest()[:12]
+    return os.path.join(CODES_FOLDER, f"voting_codes-{digest}.pdf")
+
+
+def build_codes_pdf(filepath):
+    with codes_pdf_lock:
+        if os.path.exists(filepath):
+            return
+
+        os.makedirs(CODES_FOLDER, exist_ok=True)
+        pdf = PDFGenerator()
+        pdf.add_codes(db.stream("voting_codes", columns=["id", "code"], order_by="id"))
+        pdf.output(filepath)
+
+        for stale in glob.glob(os.path.join(CODES_FOLDER, "voting_codes*.pdf")):
+            if stale != filepath:
+                os.remove(stale)
+
+
+def build_results_pdf(session_id, results):
+    # keyed by session and a hash of the winners, so a file is written once and
+    # every later download (or a changed result set) maps to its own name
+    top_two = [r for r in results if r.rank in (1, 2)]
+    digest = hashlib.sha1(repr([tuple(r) for r in top_two]).encode()).hexdigest()[:16]
+    filepath = os.path.join(RESULTS_FOLDER, f"election_winners-{session_id}-{digest}.pdf")
+
+    with results_pdf_lock:
+        if not os.path.exists(filepath):
+            os.makedirs(RESULTS_FOLDER, exist_ok=True)
+            pdf = ResultPDFGenerator(top_two)
+            pdf.generate(filepath)
+
+            for stale in glob.glob(os.path.join(RESULTS_FOLDER, f"election_winners-{session_id}-*.pdf")):
+                if stale != filepath:
+                    os.remove(stale)
+
+    return filepath, digest
+
+
+def load_final_results(session_id):
+    return db.query(queries.FINAL_RESULTS, [session_id])
+
+
+def flush_total_votes(rows):
+    db.execute_many(queries.ADD_TOTAL_VOTES, rows)
+
+
+# vote counts are kept in memory and written to candidates.total_votes in
+# batches; the votes table stays the source of truth they are checked against
+tally = Tally(
+    lambda: db.query(queries.VOTE_COUNTS),
+    flush_total_votes,
+    lambda: db.execute(queries.SYNC_TOTAL_VOTES),
+    flush_interval=float(os.environ.get("TALLY_FLUSH_INTERVAL", 2)),
+    reconcile_interval=float(os.environ.get("TALLY_RECONCILE_INTERVAL", 60)),
+    logger=app.logger
+)
+
+
+def load_live_results():
+    positions = db.read("positions", columns=["id", "name"], order_by="id")
+    candidates = db.read("candidates", columns=["id", "full_name", "position_id"], order_by="id")
+    return positions, candidates
+
+
+live_results = LiveResults(
+    load_live_results,
+    tally,
+    max_rate=int(os.environ.get("LIVE_RESULTS_RATE", 2)),
+    max_streams=int(os.environ.get("LIVE_RESULTS_STREAMS", 4)),
+    max_age=int(os.environ.get("LIVE_RESULTS_STREAM_SECONDS", 300))
+)
+
+
+def load_ballot():
+    positions = db.read("positions", columns=["id", "name"], order_by="id")
+    candidates = db.read("candidates", columns=["id", "full_name", "position_id", "photo_url"], order_by="id")
+
+    grouped = defaultdict(list)
+
+    for c in candidates:
+        candidate_dict = {
+            "id": c.id,
+            "name": c.full_name,
+            "position_id": c.position_id,
+            "photo_url": c.photo_url
+        }
+        grouped[candidate_dict["position_id"]].append(candidate_dict)
+
+    results_data = []
+    for p in positions:
+        results_data.append({
+            "position": {
+                "id": p.id,
+                "name": p.name
+            },
+            "candidates": grouped.get(p.id, [])
+        })
+    return results_data
+
+
+ballot_cache = BallotCache(load_ballot)
+final_results_cache = ResultsCache()
+
+
+def render_ballot(results_data):
+    return render_template("vote.html", results_data=results_data)
+
+
+def ballot_changed():
+    ballot_cache.invalidate()
+    live_results.invalidate()
+    final_results_cache.invalidate()
+
+
+def ballot_positions():
+    # candidate id -> position id, from the cached ballot so a ballot can be
+    # checked while the database is unreachable
+    return {
+        candidate["id"]: candidate["position_id"]
+        for position in ballot_cache.get()
+        for candidate in position["candidates"]
+    }
+
+
+VOTE_COLUMNS = ["voting_code_id", "candidate_id", "position_id", "timestamp"]
+
+
+def apply_ballot(entry):
+    # the journal's drainer; claiming the code first makes it idempotent, a
+    # replayed ballot that already made it to the database matches nothing
+    timestamp = datetime.fromisoformat(entry["timestamp"])
+    rows = [[entry["voting_code_id"], candidate_id, position_id, timestamp] for position_id, candidate_id in entry["votes"]]
+    try:
+        with db.transaction():
+            if not db.update("voting_codes", {"has_voted": "Yes"}, {"code": entry["code"], "has_voted": "No"}):
+                raise CodeAlreadyUsed(entry["code"])
+            if rows:
+                db.insert_many("votes", VOTE_COLUMNS, rows)
+    except (CodeAlreadyUsed, IntegrityError) as e:
+        if isinstance(e, CodeAlreadyUsed):
+            stored = db.read("votes", {"voting_code_id": entry["voting_code_id"]}, columns=["position_id", "candidate_id"])
+            if sorted(map(tuple, stored)) == sorted(map(tuple, entry["votes"])):
+                raise AlreadyApplied(entry["code"])
+        app.logger.warning("Ballot not applied (%s): %s", e.__class__.__name__, json.dumps(entry))
+        return False
+
+    # total_votes is written by the tally's next batched flush
+    tally.record(dict(entry["votes"]))
+    return True
+
+
+def used_codes():
+    return [row.code for row in db.read("voting_codes", {"has_voted": "Yes"}, columns=["code"])]
+
+
+# accepted ballots are made durable here first, the voter is not kept waiting
+# on the database
+journal = BallotJournal(
+    os.environ.get("BALLOT_JOURNAL", "ballots.journal"), apply_ballot, used_codes,
+    transient=db.UNAVAILABLE, logger=app.logger
+)
+
+# a ballot is checked against the cached ballot and queued in the journal
+# under this lock; deleting a candidate and a reset take it through
+# ballots_paused(), so no acknowledged ballot can be refused by the database
+ballot_lock = threading.Lock()
+
+
+@contextmanager
+def ballots_paused(timeout=30):
+    # the long wait for the journal happens before the lock is taken, so
+    # voters keep submitting through a database stall; under the lock only
+    # the few ballots accepted meanwhile are waited for. Yields False when
+    # the database has not taken every ballot yet.
+    if not journal.drain(timeout):
+        yield False
+        return
+    with ballot_lock:
+        yield journal.drain(1)
+
+
+def ballots_waiting():
+    return f"{journal.stats()['pending']} ballot(s) are still waiting for the database, try again once it is reachable."
+
+
+# bulk admin work runs here, off the request threads that serve voters; one
+# worker by default so a reset can never interleave with a code generation
+jobs = JobQueue(max_workers=int(os.environ.get("JOB_WORKERS", 1)), context=app.app_context, logger=app.logger)
+
+
+def reset_job(job):
+    with ballots_paused() as saved:
+        if not saved:
+            job.finish(ballots_waiting(), "danger")
+            return
+        tables = ["votes", "candidates", "positions", "voting_codes", "final_results"]
+        job.progress(0, len(tables) + 1)
+        for i, table in enumerate(tables, 1):
+            db.delete_all(table)
+            job.progress(i)
+        db.update("election_sessions", {"active": 0}, {"active": 1})
+        journal.reload_codes()
+        tally.rebuild()
+        job.progress(len(tables) + 1)
+
+        ballot_changed()
+    job.finish("System has been fully reset.")
+
+
+def close_job(job, session_id):
+    # no ballot may be accepted between the drain and the ranking, it would
+    # be applied after the close and missing from final_results
+    with ballots_paused() as saved:
+        if not saved:
+            job.finish(ballots_waiting(), "danger")
+            return
+        # results are ranked and written set-based in SQL, all or nothing
+        with db.transaction():
+            if not db.update("election_sessions", {"active": 0}, {"id": session_id, "active": 1}):
+                job.finish("Election is already closed.", "info")
+                return
+            db.execute(queries.CLOSE_ELECTION, [session_id])
+
+    try:
+        build_results_pdf(session_id, final_results_cache.get(session_id, load_final_results))
+    except Exception:
+        app.logger.exception("Could not pre-build the results PDF for session %s", session_id)
+
+    job.finish("Election closed and results saved.")
+
+
+def generate_codes_job(job, quantity):
+    if db.count_rows("voting_codes"):
+        job.finish("Codes already generated. Reset if you want to regenerate!", "info")
+        return
+
+    started = time.perf_counter()
+    codes = vote_quantity(quantity)
+    timestamp = datetime.now()
+    job.progress(0, quantity)
+
+    current_year = datetime.now().year
+    session_name = f"{current_year} elections"
+
+    with db.transaction():
+        for i in range(0, len(codes), CODE_CHUNK_SIZE):
+            rows = [[code, "No", timestamp] for code in codes[i:i + CODE_CHUNK_SIZE]]
+            db.insert_many("voting_codes", ["code", "has_voted", "created_at"], rows)
+            job.progress(i + len(rows))
+
+        db.update("election_sessions", {"active": 0}, {"active": 1})
+
+        existing_session = db.read("election_sessions", clause={"name": session_name}, columns=["id"])
+        if existing_session:
+            session_id = existing_session[0].id
+            db.update("election_sessions", {"active": 1}, {"id": session_id})
+        else:
+            db.insert("election_sessions", ["name", "active"], [session_name, 1])
+
+    elapsed = time.perf_counter() - started
+    rate = round(quantity / elapsed) if elapsed else quantity
+    app.logger.info("Generated %d voting codes in %.2fs (%d codes/s)", quantity, elapsed, rate)
+
+    job.finish(f"{quantity} code(s) generated successfully in {elapsed:.2f}s ({rate} codes/s)!")
+
+
+def codes_pdf_job(job, filepath):
+    build_codes_pdf(filepath)
+    job.finish("Voting codes PDF is ready.")
+
+
+def current_job():
+    job_id = request.args.get("job")
+    return jobs.get(job_id) if job_id else None
 
 
 # Voter's routes
@@ -88,12 +429,13 @@ class VotersLoginView(MethodView):
     def post(self):
         vote_code = request.form["vote_code"].strip().upper()
 
-        result = db.read("voting_codes", {"code": vote_code})
+        result = db.read("voting_codes", {"code": vote_code}, columns=["id", "has_voted"])
         if result:
-            if result[0][2] == "Yes":
+            if result[0].has_voted == "Yes" or journal.seen(vote_code):
                 flash("This code has already been used", "danger")
                 return redirect(url_for("index"))
             session["voter_code"] = vote_code
+            session["voter_code_id"] = result[0].id
             return redirect(url_for("vote"))
         else:
             flash("Invalid Vote Code!", "danger")
@@ -104,80 +446,64 @@ class VoteView(MethodView):
     decorators = [voter_required]
 
     def get(self):
-        positions = db.read("positions")
-        candidates = db.read("candidates")
-
-        grouped = defaultdict(list)
-
-        for c in candidates:
-            candidate_dict = {
-                "id": c[0],
-                "name": c[1],
-                "position_id": c[5],
-                "photo_url": c[4]
-            }
-            grouped[candidate_dict["position_id"]].append(candidate_dict)
-
-        results_data = []
-        for p in positions:
-            results_data.append({
-                "position": {
-                    "id": p[0],
-                    "name": p[1]
-                },
-                "candidates": grouped.get(p[0], [])
-            })
-
-        return render_template("vote.html", results_data=results_data)
+        # the ballot cannot change without going through ballot_changed(), so
+        # voters are served the cached page without touching the database
+        if session.get("_flashes"):
+            return render_template("vote.html", results_data=ballot_cache.get())
+        return ballot_cache.render(render_ballot)
     
 
     def post(self):
         voter_code = session.get("voter_code")
 
-        voting_code = db.read("voting_codes", clause={"code": voter_code})     
-        voting_code_id = voting_code[0][0]
-       
-        positions = db.read("positions")
-        votes_to_insert = []
-
-        for position in positions:
-            position_id = position[0]
-            form_field = f"vote_{position_id}"
-            candidate_id = request.form.get(form_field)
-
-            if not candidate_id:
-                continue
-
-            candidates = db.read("candidates", clause={"id": candidate_id, "position_id": position_id})
-            if not candidates:
-                flash("Invalid candidate selection.", "danger")
-                return redirect(url_for("vote"))
-
-            columns = ["voting_code_id", "candidate_id", "position_id", "timestamp"]
-            values = [
-                voting_code_id,
-                candidate_id,
-                position_id,
-                datetime.now()
-            ]
-            votes_to_insert.append(values)
+        voting_code_id = session.get("voter_code_id")
+        if voting_code_id is None:
+            voting_code = db.read("voting_codes", clause={"code": voter_code}, columns=["id"])
+            voting_code_id = voting_code[0].id
+
+        selections = {}
+        for field, candidate_id in request.form.items():
+            if field.startswith("vote_") and candidate_id:
+                try:
+                    selections[int(field[5:])] = int(candidate_id)
+                except ValueError:
+                    flash("Invalid candidate selection.", "danger")
+                    return redirect(url_for("vote"))
+
+        entry = {
+            "code": voter_code,
+            "voting_code_id": voting_code_id,
+            "votes": list(selections.items()),
+            "timestamp": datetime.now().isoformat(timespec="seconds")
+        }
 
         try:
-            for vote in votes_to_insert:
-                db.insert("votes", columns, vote)
-
-                candidate_id = vote[1]
-                current_vote = db.read("candidates", clause={"id": candidate_id})
-                new_total = current_vote[0][-1] + 1
-                db.update("candidates", {"total_votes": new_total}, {"id": candidate_id})
-
-            session.pop("voter_code", None)
-            session["voted"] = True
-            db.update("voting_codes", {"has_voted": "Yes"}, {"code": voter_code})
-            return redirect(url_for("thank_you"))
-        except Exception as e:
+            with ballot_lock:
+                # validated against the cached ballot, no database round trip
+                candidate_positions = ballot_positions() if selections else {}
+                for position_id, candidate_id in selections.items():
+                    if candidate_positions.get(candidate_id) != position_id:
+                        flash("Invalid candidate selection.", "danger")
+                        return redirect(url_for("vote"))
+                ticket = journal.submit(entry)
+
+            # returns once the ballot is on disk; it reaches the database
+            # through the journal, even if that is down right now
+            if ticket is not None:
+                journal.wait(ticket)
+        except Exception:
+            app.logger.exception("Could not journal a ballot")
             flash("An error occurred while submitting your votes. Please try again.", "danger")
             return redirect(url_for("vote"))
+
+        session.pop("voter_code", None)
+        session.pop("voter_code_id", None)
+        if ticket is None:
+            flash("This code has already been used", "danger")
+            return redirect(url_for("index"))
+
+        session["voted"] = True
+        return redirect(url_for("thank_you"))
     
 
 class ThankYouView(MethodView):
@@ -205,7 +531,7 @@ class AdminLoginView(MethodView):
         result = db.read("admin", clause={"username": username}, columns=["password"])
 
         if result:
-            stored_password = result[0][0]
+            stored_password = result[0].password
             
             if check_password_hash(stored_password, password):
                 session["logged_in"] = True
@@ -223,24 +549,15 @@ class DashboardView(MethodView):
     decorators = [login_required] 
 
     def get(self):
-        total_candidates = db.count_rows("candidates")
-        total_positions = db.count_rows("positions")
-        total_codes = db.count_rows("voting_codes")
-
-        result = db.read("voting_codes")
-        used_codes = 0
-        for row in result:
-            if row[2] == "Yes":
-                used_codes += 1
+        # every counter and the session flag come back from a single aggregate query
+        total_candidates, total_positions, total_codes, used_codes, is_active = db.query(queries.DASHBOARD_STATS)[0]
+        is_active = bool(is_active)
 
         if total_codes > 0:
             vote_percent = round((used_codes / total_codes) * 100)
         else:
             vote_percent = 0
 
-        active_session = db.read("election_sessions", clause={"active": 1})
-        is_active = bool(active_session)
-
         return render_template(
             "dashboard.html", 
             total_candidates=total_candidates, 
@@ -248,81 +565,85 @@ class DashboardView(MethodView):
             total_codes=total_codes,
             used_codes=used_codes,
             vote_percent=vote_percent,
-            is_active=is_active
+            is_active=is_active,
+            job=current_job()
         )
     
     def post(self):
         action = request.form.get("action")
         if action == "reset":
-            db.delete_all("votes")
-            db.delete_all("candidates")
-            db.delete_all("positions")
-            db.delete_all("voting_codes")
-            db.delete_all("final_results")
-            db.update("election_sessions", {"active": 0}, {"active": 1})
-
-            flash("System has been fully reset.", "success")
-            return redirect(url_for("dashboard"))
+            job = jobs.submit("reset", reset_job, key="bulk")
+            return redirect(url_for("dashboard", job=job.id))
         
         if action == "close":
-            session = db.read("election_sessions", clause={"active": 1})
+            session = db.read("election_sessions", clause={"active": 1}, columns=["id"])
             if not session:
                 flash("No active election session.", "danger")
                 return redirect(url_for("dashboard"))
 
-            session_id = session[0][0]
-            positions = db.read("positions")
-            candidates = db.read("candidates")
-
-            grouped = defaultdict(list)
-
-            for c in candidates:
-                candidate_id = c[0]
-                position_id = c[5]
-                total_votes = c[6]
-                grouped[position_id].append((candidate_id, total_votes))
-
-            for position_id, candidate_list in grouped.items():
-                sorted_candidates = sorted(candidate_list, key=lambda x: x[1], reverse=True)
-
-                for rank, (candidate_id, votes) in enumerate(sorted_candidates, start=1):
-                    columns = ["session_id", "candidate_id", "position_id", "total_votes", "rank"]
-                    values = [session_id, candidate_id, position_id, votes, rank]
-                    db.insert("final_results", columns, values)
-
-            db.update("election_sessions", {"active": 0}, {"id": session_id})
-            flash("Election closed and results saved.", "success")
-            return redirect(url_for("final_results"))
+            job = jobs.submit(
+                "close", close_job, session[0].id, key="bulk",
+                url=url_for("final_results"), label="View final results"
+            )
+            return redirect(url_for("dashboard", job=job.id))
     
 
 class CodeView(MethodView):
     decorators = [login_required]
 
     def get(self):
-        page = int(request.args.get("page", 1))
+        page = max(request.args.get("page", 1, type=int), 1)
+        status = request.args.get("status", "")
+        search = request.args.get("q", "").strip().upper()
         per_page = 25
         offset = (page - 1) * per_page
 
-        generated_codes = db.read("voting_codes")
-        total = len(generated_codes)
-        paginated_codes = generated_codes[offset:offset + per_page]
+        clause = {}
+        if status in CODE_STATUS_FILTERS:
+            clause["has_voted"] = CODE_STATUS_FILTERS[status]
+        if search:
+            clause["code"] = search
+
+        # filtering, counting and paging all happen in SQL so only one page is fetched
+        total = db.count_rows("voting_codes", clause, prefix=["code"])
+        paginated_codes = db.read(
+            "voting_codes", clause, columns=["code", "has_voted", "created_at"], prefix=["code"],
+            order_by="id", limit=per_page, offset=offset
+        )
 
         total_pages = (total + per_page - 1) // per_page
+        first_page = max(page - 5, 1)
+        last_page = min(page + 5, total_pages)
 
-        return render_template("vote_codes.html", generated_codes=paginated_codes, total_pages=total_pages, current_page=page)
+        return render_template(
+            "vote_codes.html",
+            generated_codes=paginated_codes,
+            total_pages=total_pages,
+            current_page=page,
+            per_page=per_page,
+            page_range=range(first_page, last_page + 1),
+            status=status,
+            search=search,
+            job=current_job()
+        )
     
     def post(self):
         action = request.form.get("action")
 
         if action == "reset":
             try:
-                codes = db.read("voting_codes")
-                if not codes:
+                if not db.count_rows("voting_codes"):
                     flash("Cannot reset, no codes generated yet.", "info")
                     return redirect(url_for("generate_codes"))
 
-                db.delete_all("voting_codes")
-                session["generated"] = False
+                # a journaled ballot whose code is deleted before it is
+                # applied would be dropped
+                with ballots_paused(timeout=5) as saved:
+                    if not saved:
+                        flash(ballots_waiting(), "danger")
+                        return redirect(url_for("generate_codes"))
+                    db.delete_all("voting_codes")
+                    journal.reload_codes()
                 flash("All voting codes have been reset.", "info")
                 db.update("election_sessions", {"active": 0}, {"active": 1})
                 return redirect(url_for("generate_codes"))
@@ -336,22 +657,23 @@ class CodeView(MethodView):
 
         
         elif action == "download":
-            codes = db.read("voting_codes")
-            if not codes:
+            filepath = codes_pdf_path()
+            if not filepath:
                 flash("No codes available for download.", "info")
                 return redirect(url_for("generate_codes"))
-            
-            os.makedirs("static/codes", exist_ok=True)
-            filepath = "static/codes/voting_codes.pdf"
-            pdf = PDFGenerator()
-            pdf.add_codes(codes)
-            pdf.output(filepath)
-            return send_from_directory("static/codes", "voting_codes.pdf", as_attachment=True)
+
+            if os.path.exists(filepath):
+                return redirect(url_for("codes_pdf"))
+
+            job = jobs.submit(
+                "codes_pdf", codes_pdf_job, filepath, key="codes_pdf",
+                url=url_for("codes_pdf"), label="Download PDF"
+            )
+            return redirect(url_for("generate_codes", job=job.id))
         
 
         elif action == "generate":
-            codes = db.read("voting_codes")
-            if codes:
+            if db.count_rows("voting_codes"):
                 flash("Codes already generated. Reset if you want to regenerate!", "info")
                 return redirect(url_for("generate_codes"))
             
@@ -360,36 +682,40 @@ class CodeView(MethodView):
                 flash("Please enter a valid number", "info")
                 return redirect(url_for("generate_codes"))
             
-            codes = vote_quantity(quantity)
-            for code in codes:
-                timestamp = datetime.now()
-                db.insert("voting_codes", ["code", "has_voted", "created_at"], [code, "No", timestamp])
-            
-            session["generated"] = True
-            flash(f"{quantity} code(s) generated successfully!", "success")
-
-            current_year = datetime.now().year
-            session_name = f"{current_year} elections"
-            db.update("election_sessions", {"active": 0}, {"active": 1})
-
-            existing_session = db.read("election_sessions", clause={"name": session_name})
-            if existing_session:
-                session_id = existing_session[0][0]
-                db.update("election_sessions", {"active": 1}, {"id": session_id})
-            else:
-                db.insert("election_sessions", ["name", "active"], [session_name, 1])
-
-            return redirect(url_for("generate_codes"))
+            job = jobs.submit("generate_codes", generate_codes_job, quantity, key="bulk")
+            return redirect(url_for("generate_codes", job=job.id))
         
         flash("Invalid action", "danger")
         return redirect(url_for("generate_codes"))
     
 
+class CodesPDFView(MethodView):
+    decorators = [login_required]
+
+    def get(self):
+        filepath = codes_pdf_path()
+        if not filepath or not os.path.exists(filepath):
+            flash("No codes available for download.", "info")
+            return redirect(url_for("generate_codes"))
+
+        return send_file(filepath, as_attachment=True, download_name="voting_codes.pdf")
+
+
+class JobView(MethodView):
+    decorators = [login_required]
+
+    def get(self, job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job"}), 404
+        return jsonify(job.to_dict())
+
+
 class PositionsView(MethodView):
     decorators = [login_required]
 
     def get(self, edit_id=None):
-        created_positions = db.read("positions")
+        created_positions = db.read("positions", columns=["id", "name"], order_by="id")
         return render_template("positions.html", created_positions=created_positions, edit_id=edit_id)
     
     def post(self):
@@ -399,6 +725,7 @@ class PositionsView(MethodView):
             position = request.form.get("positions")
             if position:
                 db.insert("positions", ["name"], [position])
+                ballot_changed()
                 flash("Position created successfully!", "success")
             return redirect(url_for("positions"))
         
@@ -406,6 +733,7 @@ class PositionsView(MethodView):
             position_id = request.form.get("position_id")
             if position_id:
                 db.delete("positions", {"id": int(position_id)})
+                ballot_changed()
                 flash("Position deleted successfully!", "success")
             else:
                 flash("Invalid position ID", "danger")
@@ -420,6 +748,7 @@ class PositionsView(MethodView):
             new_name = request.form.get("new_name")
             if position_id and new_name:
                 db.update("positions", {"name": new_name}, {"id": int(position_id)})
+                ballot_changed()
                 flash("Position updated successfully!", "success")
             return redirect(url_for("positions"))
         
@@ -432,27 +761,27 @@ class AddCandidatesView(MethodView):
     def get(self):
         form = CandidateForm()
 
-        positions = db.read("positions")
-        form.position.choices = [(p[0], p[1]) for p in positions]
+        positions = db.read("positions", columns=["id", "name"], order_by="id")
+        form.position.choices = [(p.id, p.name) for p in positions]
 
         return render_template("add_candidates.html", form=form)
     
     def post(self):
         form = CandidateForm()
 
-        positions = db.read("positions")
-        form.position.choices = [(p[0], p[1]) for p in positions]
+        positions = db.read("positions", columns=["id", "name"], order_by="id")
+        form.position.choices = [(p.id, p.name) for p in positions]
 
         if form.validate_on_submit():
             photo_file = form.photo.data
             if photo_file and photo_file.filename:
-                filename = secure_filename(photo_file.filename)
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                photo_file.save(filepath)
+                try:
+                    photo_path = photos.save(photo_file)
+                except InvalidPhoto:
+                    flash("That photo could not be read, please upload a JPG or PNG image.", "danger")
+                    return render_template("add_candidates.html", form=form)
             else:
-                filename = DEFAULT_PHOTO
-        
-            photo_path = os.path.join("uploads", filename)
+                photo_path = os.path.join("uploads", DEFAULT_PHOTO)
                 
             columns = ["full_name", "class_name", "gender", "photo_url", "position_id"]
             values = [
@@ -464,6 +793,7 @@ class AddCandidatesView(MethodView):
             ]
             db.insert("candidates", columns, values)
 
+            ballot_changed()
             flash("Candidate added successfully!", "success")
             return redirect(url_for("candidates"))
         
@@ -474,18 +804,18 @@ class CandidateView(MethodView):
     decorators = [login_required]
     
     def get(self):
-        candidates = db.read("candidates")
-        positions = dict(db.read("positions"))
+        candidates = db.read("candidates", columns=["id", "full_name", "class_name", "gender", "photo_url", "position_id"], order_by="id")
+        positions = dict(db.read("positions", columns=["id", "name"]))
 
         joined_candidates = []
         for c in candidates:
             candidate_dict = {
-                "id": c[0],
-                "photo_url": c[4],
-                "full_name": c[1],
-                "gender": c[3],
-                "class_name": c[2],
-                "position": positions.get(c[5], "Unknown")
+                "id": c.id,
+                "photo_url": c.photo_url,
+                "full_name": c.full_name,
+                "gender": c.gender,
+                "class_name": c.class_name,
+                "position": positions.get(c.position_id, "Unknown")
             }
             joined_candidates.append(candidate_dict)
         return render_template("candidates.html", candidates=joined_candidates)
@@ -497,16 +827,17 @@ class EditCandidateView(MethodView):
     def get(self, candidate_id):
         form = CandidateForm()
 
-        positions = db.read("positions")
-        form.position.choices = [(p[0], p[1]) for p in positions]
+        positions = db.read("positions", columns=["id", "name"], order_by="id")
+        form.position.choices = [(p.id, p.name) for p in positions]
 
-        candidate = db.read("candidates", {"id": candidate_id})
+        candidate = db.read("candidates", {"id": candidate_id}, columns=["full_name", "class_name", "gender", "photo_url", "position_id"])
         if candidate:
-            form.fullname.data = candidate[0][1]
-            form.class_name.data = candidate[0][2]
-            form.gender.data = candidate[0][3]
-            form.photo.data = candidate[0][4]
-            form.position.data = candidate[0][5]
+            candidate = candidate[0]
+            form.fullname.data = candidate.full_name
+            form.class_name.data = candidate.class_name
+            form.gender.data = candidate.gender
+            form.photo.data = candidate.photo_url
+            form.position.data = candidate.position_id
         else:
             flash("Candidate not found!", "danger")
             return redirect(url_for("candidates"))
@@ -516,20 +847,21 @@ class EditCandidateView(MethodView):
     def post(self, candidate_id=None):
         form = CandidateForm()
 
-        positions = db.read("positions")
-        form.position.choices = [(p[0], p[1]) for p in positions]
+        positions = db.read("positions", columns=["id", "name"], order_by="id")
+        form.position.choices = [(p.id, p.name) for p in positions]
         action = request.form.get("action")
 
         if action == "update_candidate" and candidate_id:
             if form.validate_on_submit():
                 photo_file = form.photo.data
                 if photo_file and photo_file.filename:
-                    filename = secure_filename(photo_file.filename)
-                    filepath = os.path.join(UPLOAD_FOLDER, filename)
-                    photo_file.save(filepath)
-                    photo_path = os.path.join("uploads", filename)
+                    try:
+                        photo_path = photos.save(photo_file)
+                    except InvalidPhoto:
+                        flash("That photo could not be read, please upload a JPG or PNG image.", "danger")
+                        return redirect(url_for("edit_candidate", candidate_id=candidate_id))
                 else:
-                    photo_path = db.read("candidates", {"id": candidate_id})[0][4]
+                    photo_path = db.read("candidates", {"id": candidate_id}, columns=["photo_url"])[0].photo_url
             
                 db.update(
                     "candidates", 
@@ -542,6 +874,7 @@ class EditCandidateView(MethodView):
                     },
                     {"id": candidate_id}
                 )
+                ballot_changed()
                 flash("Candidate updated successfully!", "success")
                 return redirect(url_for("candidates"))
             
@@ -549,7 +882,14 @@ class EditCandidateView(MethodView):
             try:
                 candidate_id = request.form.get("candidate_id")
                 if candidate_id:
-                    db.delete("candidates", {"id": int(candidate_id)})
+                    # ballots for the candidate still in the journal would be
+                    # refused by the database once it is gone
+                    with ballots_paused(timeout=5) as saved:
+                        if not saved:
+                            flash(ballots_waiting(), "danger")
+                            return redirect(url_for("candidates"))
+                        db.delete("candidates", {"id": int(candidate_id)})
+                        ballot_changed()
                     flash("Candidate deleted successfully!", "success")
                 else:
                     flash("Invalid candidate ID", "danger")
@@ -569,92 +909,108 @@ class ResultsView(MethodView):
     decorators = [login_required]
 
     def get(self):
-        total_positions = db.count_rows("positions")
-        total_candidates = db.count_rows("candidates")
+        # served from the in-process snapshot, ballots update it as they commit
+        snapshot = live_results.snapshot()
 
-        positions = db.read("positions") 
-        candidates = db.read("candidates") 
+        return render_template(
+            "results.html", 
+            total_positions=snapshot["total_positions"],
+            total_candidates=snapshot["total_candidates"],
+            results_data=snapshot["results"]
+        )
 
-        positions_dict = dict(positions)
 
-        grouped_candidates = defaultdict(list)
+class ResultsDataView(MethodView):
+    decorators = [login_required]
 
-        votes_per_position = defaultdict(int)
-        for c in candidates:
-            position_id = c[5]
-            total_votes = c[6]
-            votes_per_position[position_id] += total_votes
+    def get(self):
+        return jsonify(live_results.snapshot())
 
-        for c in candidates:
-            candidate_id, full_name, class_name, gender, photo_url, position_id, total_votes = c
 
-            position_total = votes_per_position[position_id] or 1
-            percentage = round((total_votes / position_total) * 100)
+class TallyStatsView(MethodView):
+    decorators = [login_required]
 
-            grouped_candidates[position_id].append({
-                "id": candidate_id,
-                "full_name": full_name,
-                "class_name": class_name,
-                "gender": gender,
-                "photo_url": photo_url,
-                "position_id": position_id,
-                "total_votes": total_votes,
-                "position_name": positions_dict.get(position_id, "Unknown"),
-                "percentage": percentage
-            })
+    def get(self):
+        return jsonify(tally.stats())
 
-        results_data = []
-        for pos_id, candidates_list in grouped_candidates.items():
-            results_data.append({
-                "position": {
-                    "id": pos_id,
-                    "name": positions_dict.get(pos_id, "Unknown")
-                },
-                "candidates": candidates_list
-            })
 
-        return render_template(
-            "results.html", 
-            total_positions=total_positions,
-            total_candidates=total_candidates,
-            results_data=results_data
+class MetricsView(MethodView):
+    # scrapers authenticate with METRICS_TOKEN, a logged-in admin can just open it
+    def get(self):
+        token = os.environ.get("METRICS_TOKEN")
+        authorized = session.get("logged_in") or (token and request.headers.get("Authorization") == f"Bearer {token}")
+        if not authorized:
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+
+        pool = db.pool_stats()
+        counts = tally.stats()
+        ballots = journal.stats()
+        gauges = [
+            ("nominex_db_pool_size", "Maximum connections in the pool.", pool["size"]),
+            ("nominex_db_pool_open", "Connections currently open.", pool["open"]),
+            ("nominex_db_pool_in_use", "Connections checked out.", pool["in_use"]),
+            ("nominex_db_pool_idle", "Connections idle in the pool.", pool["idle"]),
+            ("nominex_db_pool_checkouts", "Connections handed out since start.", pool["checkouts"]),
+            ("nominex_db_pool_waits", "Checkouts that had to wait for a connection.", pool["waits"]),
+            ("nominex_db_pool_reconnects", "Connections reopened after a failed ping.", pool["reconnects"]),
+            ("nominex_tally_votes", "Votes held by the in-memory tally.", counts["votes"]),
+            ("nominex_tally_pending", "Votes not yet flushed to candidates.total_votes.", counts["pending"]),
+            ("nominex_tally_drift_votes", "Votes corrected by reconciliation since start.", counts["drift_votes"]),
+            ("nominex_journal_pending", "Journaled ballots not yet in the database.", ballots["pending"]),
+            ("nominex_journal_accepted", "Ballots journaled since start.", ballots["accepted"]),
+            ("nominex_journal_rejected", "Journaled ballots the database refused.", ballots["rejected"]),
+            ("nominex_journal_duplicates", "Replayed ballots the database already had.", ballots["duplicates"]),
+            ("nominex_journal_syncs", "Journal fsyncs since start.", ballots["syncs"]),
+            ("nominex_journal_apply_errors", "Failed attempts to apply a journaled ballot.", ballots["apply_errors"]),
+            ("nominex_live_streams", "Live results streams open.", live_results.streams),
+        ]
+        return Response(profiler.render(gauges, db.statement_stats()), mimetype="text/plain; version=0.0.4")
+
+
+class HealthView(MethodView):
+    # readiness probe: 503 until serve.py has warmed up, once it starts
+    # shutting down, or while the database is unreachable
+    def get(self):
+        if not app.config.get("READY", True):
+            return jsonify(status="unavailable"), 503
+        try:
+            db.query("SELECT 1")
+        except Exception:
+            app.logger.exception("Health check could not reach the database")
+            return jsonify(status="database unavailable"), 503
+        return jsonify(status="ok")
+
+
+class ResultsStreamView(MethodView):
+    decorators = [login_required]
+
+    def get(self):
+        if not live_results.open_stream():
+            # every stream slot is taken: the page polls results.json instead
+            return Response(
+                "retry: 30000\n\n",
+                status=503,
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "Retry-After": "30"}
+            )
+
+        response = Response(
+            live_results.stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
+        response.call_on_close(live_results.close_stream)
+        return response
     
 
 class FinalResultsView(MethodView):
     def _get_final_results(self):
-        session = db.read("election_sessions", clause={"active": 0})
+        session = db.read("election_sessions", clause={"active": 0}, columns=["id"], order_by="id DESC", limit=1)
         if not session:
             return None, []
 
-        latest_session = sorted(session, key=lambda x: x[0], reverse=True)[0]
-        session_id = latest_session[0]
-        results = db.read("final_results", clause={"session_id": session_id})
-        positions = db.read("positions")
-        candidates = db.read("candidates")
-
-        position_map = {p[0]: p[1] for p in positions}
-        candidate_map = {c[0]: c for c in candidates}
-
-        final_results = []
-        for r in results:
-            _, _, candidate_id, position_id, votes, rank, _ = r
-            # if rank not in (1, 2):
-            #     continue
-            candidate = candidate_map.get(candidate_id)
-            if not candidate:
-                continue
-            final_results.append((
-                candidate[1],
-                candidate[2],
-                candidate[3],
-                candidate[4],
-                position_map.get(position_id, "Unknown"),
-                votes,
-                rank
-            ))
-
-        return session_id, final_results
+        session_id = session[0].id
+        return session_id, final_results_cache.get(session_id, load_final_results)
 
     def get(self):
         session_id, results = self._get_final_results()
@@ -682,14 +1038,28 @@ class FinalResultsView(MethodView):
     def post(self):
         action = request.form.get("action")
         if action == "download_results":
-            _, results = self._get_final_results()
+            return send_results_pdf(*self._get_final_results())
 
-            os.makedirs("static/results", exist_ok=True)
-            top_two = [r for r in results if r[6] in (1, 2)]
-            filepath = "static/results/election_winners.pdf"
-            pdf = ResultPDFGenerator(top_two)
-            pdf.generate(filepath)
-            return send_from_directory("static/results", "election_winners.pdf", as_attachment=True)
+
+class FinalResultsPDFView(FinalResultsView):
+    def get(self):
+        return send_results_pdf(*self._get_final_results())
+
+
+def send_results_pdf(session_id, results):
+    if session_id is None:
+        flash("Cannot view final results until elections are closed!.", "info")
+        return redirect(url_for("dashboard"))
+
+    filepath, digest = build_results_pdf(session_id, results)
+    # conditional: a repeat download with a matching ETag gets a 304
+    return send_file(
+        filepath,
+        as_attachment=True,
+        download_name="election_winners.pdf",
+        etag=digest,
+        conditional=True
+    )
 
         
 class ChangePasswordView(MethodView):
@@ -719,7 +1089,7 @@ class ChangePasswordView(MethodView):
                 flash("Admin not found.", "danger")
                 return render_template("update_password.html", form=form)
 
-            stored_password = user[0][0]
+            stored_password = user[0].password
 
             if not check_password_hash(stored_password, current_pwd):
                 flash("Incorrect current password.", "danger")
@@ -733,6 +1103,100 @@ class ChangePasswordView(MethodView):
         return render_template("update_password.html", form=form)
 
 
+# tables whose ids can be compacted, with the columns that reference them
+COMPACT_REFERENCES = {
+    "positions": [("candidates", "position_id"), ("votes", "position_id"), ("final_results", "position_id")],
+    "candidates": [("votes", "candidate_id"), ("final_results", "candidate_id")],
+    "voting_codes": [("votes", "voting_code_id")],
+    "election_sessions": [("final_results", "session_id")],
+}
+
+
+@app.cli.command("compact-ids")
+@click.argument("table", type=click.Choice(sorted(COMPACT_REFERENCES)))
+def compact_ids(table):
+    """Renumber TABLE ids to 1..n (offline maintenance, not during voting)."""
+    moved = db.compact_ids(table, COMPACT_REFERENCES[table])
+    ballot_changed()
+    click.echo(f"Renumbered {moved} {table} row(s).")
+
+
+@app.cli.command("migrate")
+@click.option("--to", "target", type=int, default=None, help="Stop after this migration version.")
+def migrate(target):
+    """Apply pending schema migrations and create missing indexes."""
+    applied = migrations.migrate(db, target)
+    for number, name in applied:
+        click.echo(f"Applied {number}: {name}")
+    click.echo(f"Schema is at version {migrations.current_version(db)}.")
+    check_indexes()
+
+
+@app.cli.command("create-admin")
+@click.argument("username")
+@click.password_option()
+def create_admin(username, password):
+    """Add an admin account, or reset the password of an existing one."""
+    hashed_password = generate_password_hash(password, method='pbkdf2:sha256', salt_length=16)
+    if db.update("admin", {"password": hashed_password}, {"username": username}):
+        click.echo(f"Password of {username} updated.")
+    else:
+        db.insert("admin", ["username", "password"], [username, hashed_password])
+        click.echo(f"Admin {username} created.")
+
+
+def check_indexes():
+    # run at startup: an unindexed lookup still works, it just scans the table
+    try:
+        missing = migrations.missing_indexes(db)
+    except Exception:
+        app.logger.exception("Could not check database indexes")
+        return None
+
+    for name, table, columns, _ in missing:
+        app.logger.warning(
+            "Missing index %s on %s(%s), run `flask --app main migrate`", name, table, ", ".join(columns)
+        )
+    return missing
+
+
+def warm_up(connections=None):
+    # run by serve.py before the socket accepts anything, so the first voters
+    # do not pay for connecting, the tally rebuild or the first ballot render
+    if connections and db.pool.size:
+        # every request thread, the journal drainer, the tally thread and the
+        # job workers may each hold a connection at the same time
+        needed = connections + 2 + jobs.max_workers
+        if not os.environ.get("DB_POOL_SIZE"):
+            db.pool.size = needed
+        elif db.pool.size < needed:
+            app.logger.warning(
+                "DB_POOL_SIZE=%d is below the %d connections %d request threads can use; requests will queue for one",
+                db.pool.size, needed, connections
+            )
+
+    held = [db.pool.acquire() for _ in range(min(connections or db.pool.size, db.pool.size))]
+    for conn in held:
+        db.pool.release(conn)
+
+    check_indexes()
+    tally.start()
+    journal.start()
+    live_results.snapshot()
+    with app.test_request_context():
+        ballot_cache.render(render_ballot)
+    assets.manifest()
+
+
+def shut_down():
+    # queued bulk work first, it may still write; then the journaled ballots
+    # and the last tally deltas
+    jobs.shutdown(wait=True)
+    journal.stop()
+    tally.stop()
+    db.close()
+
+
 @app.route("/logout")
 @login_required
 def logout():
@@ -749,14 +1213,25 @@ app.add_url_rule("/thank-you", view_func=ThankYouView.as_view("thank_you"))
 app.add_url_rule("/admin/login", view_func=AdminLoginView.as_view("login"))
 app.add_url_rule("/admin/dashboard", view_func=DashboardView.as_view("dashboard"))
 app.add_url_rule("/admin/generate-codes", view_func=CodeView.as_view("generate_codes"))
+app.add_url_rule("/admin/generate-codes/voting_codes.pdf", view_func=CodesPDFView.as_view("codes_pdf"))
+app.add_url_rule("/admin/jobs/<job_id>", view_func=JobView.as_view("job_status"))
 app.add_url_rule("/admin/positions", view_func=PositionsView.as_view("positions"))
 app.add_url_rule("/admin/add-candidates", view_func=AddCandidatesView.as_view("add_candidates"))
 app.add_url_rule("/admin/candidates", view_func=CandidateView.as_view("candidates"))
 app.add_url_rule("/admin/edit-candidate/<int:candidate_id>", view_func=EditCandidateView.as_view("edit_candidate"))
 app.add_url_rule("/admin/results", view_func=ResultsView.as_view("results"))
+app.add_url_rule("/admin/results.json", view_func=ResultsDataView.as_view("results_data"))
+app.add_url_rule("/admin/results/stream", view_func=ResultsStreamView.as_view("results_stream"))
+app.add_url_rule("/admin/tally.json", view_func=TallyStatsView.as_view("tally_stats"))
+app.add_url_rule("/admin/metrics", view_func=MetricsView.as_view("metrics"))
 app.add_url_rule("/admin/final-results", view_func=FinalResultsView.as_view("final_results"))
+app.add_url_rule("/admin/final-results/winners.pdf", view_func=FinalResultsPDFView.as_view("final_results_pdf"))
 app.add_url_rule("/change-password", view_func=ChangePasswordView.as_view("change_password"))
+app.add_url_rule("/healthz", view_func=HealthView.as_view("healthz"))
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # the production server, so the PyInstaller build ships it too; use
+    # `flask --app main run --debug` while developing
+    from serve import cli
+    cli(app, warm_up, shut_down)
\ No newline at end of file
@@ -1,6 +1,21 @@
+import os
+import tempfile
 from fpdf import FPDF
 from datetime import datetime
 
+
+def write_atomic(pdf, filepath):
+    # render next to the target and rename so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        pdf.output(tmp_path)
+        os.replace(tmp_path, filepath)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
 class PDFGenerator:
     def __init__(self, title="Voting Codes"):
         self.title = title
@@ -26,7 +41,7 @@ class PDFGenerator:
                 self.pdf.ln(row_height)
 
     def output(self, filepath):
-        self.pdf.output(filepath)
+        write_atomic(self.pdf, filepath)
 
 
 class ResultPDFGenerator:
@@ -80,4 +95,4 @@ class ResultPDFGenerator:
             pdf.cell(30, 8, class_name, 1)
             pdf.cell(30, 8, str(total_votes), 1, ln=True)
 
-        pdf.output(filename)
+        write_atomic(pdf, filename)
@@ -0,0 +1,145 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# (width, height) of every variant; the ballot card and the admin lists
+THUMBNAIL_SIZES = {
+    "ballot": (150, 100),
+    "admin": (120, 80),
+}
+FULL_SIZE = (600, 600)
+
+HASHED_NAME = re.compile(r"^[0-9a-f]{40}(-[a-z]+)?\.jpg$")
+
+# refuse anything that would decode to a huge bitmap; Pillow itself only
+# raises at twice its limit and merely warns below that, so the size from
+# the header is checked before anything is decoded
+MAX_PIXELS = 40_000_000
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+
+class InvalidPhoto(Exception):
+    pass
+
+
+def is_hashed(filename):
+    # content-hashed files never change, so they can be cached forever
+    return bool(HASHED_NAME.match(os.path.basename(filename)))
+
+
+class PhotoStore:
+    def __init__(self, static_folder, upload_dir="uploads", quality=85):
+        self.static_folder = static_folder
+        self.upload_dir = upload_dir
+        self.quality = quality
+
+        self._lock = threading.Lock()
+        self._thumbnails = {}   # (photo_url, size) -> thumbnail photo_url
+
+    def _path(self, photo_url):
+        return os.path.join(self.static_folder, photo_url)
+
+    def _write(self, image, photo_url):
+        # JPEG written without exif/icc, through a temp file so a reader never
+        # sees half an image
+        filepath = self._path(photo_url)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, "JPEG", quality=self.quality, optimize=True, progressive=True)
+            os.replace(tmp, filepath)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _decode(self, data):
+        try:
+            image = Image.open(io.BytesIO(data))
+            width, height = image.size
+            if width * height > MAX_PIXELS:
+                raise InvalidPhoto(f"Image is too large ({width}x{height})")
+            image.load()
+            image = ImageOps.exif_transpose(image)
+        # corrupt files surface as any of these, depending on the decoder
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+            raise InvalidPhoto(str(e))
+
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            return background
+        return image.convert("RGB")
+
+    def _variants(self, image, digest):
+        for size, dimensions in THUMBNAIL_SIZES.items():
+            thumb = ImageOps.fit(image, dimensions, Image.LANCZOS)
+            self._write(thumb, f"{self.upload_dir}/{digest}-{size}.jpg")
+
+        # written last, its presence means every variant is there
+        full = image.copy()
+        full.thumbnail(FULL_SIZE)
+        self._write(full, f"{self.upload_dir}/{digest}.jpg")
+
+    def save(self, file_storage):
+        # decoded once, every variant is cut from the same bitmap; identical
+        # uploads hash to the same name and are only processed the first time
+        data = file_storage.read()
+        digest = hashlib.sha1(data).hexdigest()
+        photo_url = f"{self.upload_dir}/{digest}.jpg"
+
+        if not os.path.exists(self._path(photo_url)):
+            self._variants(self._decode(data), digest)
+        return photo_url
+
+    def thumbnail_name(self, photo_url, size):
+        stem = os.path.splitext(photo_url)[0]
+        return f"{stem}-{size}.jpg"
+
+    def thumbnail(self, photo_url, size):
+        # used from templates; photos uploaded before this pipeline existed are
+        # thumbnailed on first use under a hash of their content
+        key = (photo_url, size)
+        cached = self._thumbnails.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            cached = self._thumbnails.get(key)
+            if cached is not None:
+                return cached
+
+            result = photo_url
+            if photo_url and size in THUMBNAIL_SIZES:
+                if is_hashed(photo_url):
+                    name = self.thumbnail_name(photo_url, size)
+                    if os.path.exists(self._path(name)):
+                        result = name
+                else:
+                    result = self._legacy_thumbnail(photo_url, size)
+
+            self._thumbnails[key] = result
+            return result
+
+    def _legacy_thumbnail(self, photo_url, size):
+        try:
+            with open(self._path(photo_url), "rb") as f:
+                data = f.read()
+        except OSError:
+            return photo_url
+
+        digest = hashlib.sha1(data).hexdigest()
+        name = f"{self.upload_dir}/{digest}-{size}.jpg"
+        if not os.path.exists(self._path(name)):
+            try:
+                image = self._decode(data)
+            except InvalidPhoto:
+                return photo_url
+            self._write(ImageOps.fit(image, THUMBNAIL_SIZES[size], Image.LANCZOS), name)
+        return name
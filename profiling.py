@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import defaultdict
+from flask import current_app, g, has_request_context, request
+from markupsafe import escape
+
+
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+def label(value):
+    # label values are quoted; backslash, quote and newline must be escaped
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}    # label -> [count per bucket..., sum, count]
+
+    def observe(self, label, value):
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def lines(self, name, label_name):
+        for label, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                yield f'{name}_bucket{{{label_name}="{label}",le="{bound}"}} {count}'
+            yield f'{name}_bucket{{{label_name}="{label}",le="+Inf"}} {series[-1]}'
+            yield f'{name}_sum{{{label_name}="{label}"}} {series[-2]:.6f}'
+            yield f'{name}_count{{{label_name}="{label}"}} {series[-1]}'
+
+
+class QueryProfiler:
+    def __init__(self, slow_query_ms=200, toolbar=False):
+        self.slow_query_ms = slow_query_ms
+        self.toolbar = toolbar
+        self.logger = None
+
+        self._lock = threading.Lock()
+        self.queries = defaultdict(int)
+        self.rows = defaultdict(int)
+        self.slow_queries = defaultdict(int)
+        self.requests = defaultdict(int)
+        self.query_seconds = Histogram(QUERY_BUCKETS)
+        self.request_seconds = Histogram(REQUEST_BUCKETS)
+        self.request_queries = Histogram(COUNT_BUCKETS)
+
+    def init_app(self, app, db):
+        self.logger = app.logger
+        db.add_listener(self.record)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _endpoint(self):
+        # statements run by the job queue, the tally thread or a streamed
+        # response outlive their request and are grouped together
+        if has_request_context():
+            return request.endpoint or "unknown"
+        return "background"
+
+    def record(self, sql, elapsed, rowcount):
+        endpoint = self._endpoint()
+        with self._lock:
+            self.queries[endpoint] += 1
+            self.rows[endpoint] += rowcount or 0
+            self.query_seconds.observe(endpoint, elapsed)
+
+        if has_request_context():
+            queries = g.get("_profile_queries")
+            if queries is not None:
+                queries.append((sql, elapsed, rowcount))
+
+        if self.slow_query_ms and elapsed * 1000 >= self.slow_query_ms:
+            with self._lock:
+                self.slow_queries[endpoint] += 1
+            if self.logger is not None:
+                self.logger.warning("Slow query (%.1f ms, %s rows) in %s: %s", elapsed * 1000, rowcount, endpoint, sql)
+
+    def _start(self):
+        g._profile_started = time.perf_counter()
+        g._profile_queries = []
+
+    def _finish(self, response):
+        queries = g.pop("_profile_queries", None)
+        if queries is None:
+            return response
+
+        elapsed = time.perf_counter() - g.pop("_profile_started")
+        endpoint = self._endpoint()
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.request_seconds.observe(endpoint, elapsed)
+            self.request_queries.observe(endpoint, len(queries))
+
+        db_ms = sum(q[1] for q in queries) * 1000
+        response.headers["Server-Timing"] = f'db;dur={db_ms:.2f};desc="{len(queries)} queries"'
+
+        if (self.toolbar or current_app.debug) and response.mimetype == "text/html" \
+                and not response.is_streamed and not response.direct_passthrough \
+                and "Content-Encoding" not in response.headers:
+            self._inject(response, queries, db_ms, elapsed)
+        return response
+
+    def summary(self, queries):
+        # one entry per statement shape, so a query repeated in a loop stands out
+        grouped = {}
+        for sql, elapsed, rowcount in queries:
+            entry = grouped.setdefault(sql, {"sql": sql, "calls": 0, "ms": 0.0, "rows": 0})
+            entry["calls"] += 1
+            entry["ms"] += elapsed * 1000
+            entry["rows"] += rowcount or 0
+        return sorted(grouped.values(), key=lambda e: e["ms"], reverse=True)
+
+    def _inject(self, response, queries, db_ms, elapsed):
+        body = response.get_data(as_text=True)
+        if "</body>" not in body:
+            return
+
+        rows = "".join(
+            f'<tr><td>{e["calls"]}</td><td>{e["ms"]:.2f}</td><td>{e["rows"]}</td>'
+            f'<td><code>{escape(e["sql"])}</code></td></tr>'
+            for e in self.summary(queries)
+        )
+        panel = (
+            '<details style="position:fixed;bottom:0;right:0;z-index:9999;max-width:60%;max-height:50%;'
+            'overflow:auto;background:#fff;border:1px solid #ccc;font-size:12px;padding:4px 8px">'
+            f'<summary>{len(queries)} queries, {db_ms:.1f} ms in db, {elapsed * 1000:.1f} ms total</summary>'
+            '<table class="table table-sm mb-0"><tr><th>calls</th><th>ms</th><th>rows</th><th>sql</th></tr>'
+            f'{rows}</table></details>'
+        )
+        response.set_data(body.replace("</body>", panel + "</body>", 1))
+
+    def render(self, gauges=(), statements=()):
+        # Prometheus text exposition format; gauges are (name, help, value) extras
+        # and statements the per-statement totals from Database.statement_stats()
+        with self._lock:
+            lines = []
+            counters = [
+                ("nominex_db_queries_total", "Statements executed, by endpoint.", self.queries),
+                ("nominex_db_rows_total", "Rows returned or affected, by endpoint.", self.rows),
+                ("nominex_db_slow_queries_total", "Statements slower than the slow query threshold.", self.slow_queries),
+                ("nominex_http_requests_total", "Requests served, by endpoint.", self.requests),
+            ]
+            for name, help_text, values in counters:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f'{name}{{endpoint="{endpoint}"}} {value}' for endpoint, value in sorted(values.items())]
+
+            histograms = [
+                ("nominex_db_query_seconds", "Statement latency, by endpoint.", self.query_seconds),
+                ("nominex_http_request_seconds", "Request latency, by endpoint.", self.request_seconds),
+                ("nominex_http_request_queries", "Statements per request, by endpoint.", self.request_queries),
+            ]
+            for name, help_text, histogram in histograms:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                lines += histogram.lines(name, "endpoint")
+
+        for name, help_text, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+        per_statement = [
+            ("nominex_db_statement_calls_total", "Executions, by statement shape.", "counter", lambda s: s["calls"]),
+            ("nominex_db_statement_seconds_total", "Time spent, by statement shape.", "counter", lambda s: s["total_ms"] / 1000),
+            ("nominex_db_statement_max_seconds", "Slowest execution, by statement shape.", "gauge", lambda s: s["max_ms"] / 1000),
+            ("nominex_db_statement_rows_total", "Rows returned or affected, by statement shape.", "counter", lambda s: s["rows"]),
+        ]
+        if statements:
+            for name, help_text, kind, value in per_statement:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines += [f'{name}{{statement="{label(s["sql"])}"}} {value(s)}' for s in statements]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,92 @@
+"""Production entry point: the app behind waitress instead of the dev server.
+
+    python serve.py [--host 0.0.0.0] [--port 5000] [--threads N] [--shutdown-delay S]
+
+One process with a pool of worker threads. The vote tally, the ballot and
+results caches and the job queue live in memory, so pre-forked workers would
+each hold their own copy; threads share them, and requests spend most of
+their time waiting on MySQL, which releases the GIL.
+
+The app is imported, connected and warmed up before the socket is opened,
+and /healthz reports ready once it is serving. On SIGTERM /healthz answers
+503 for --shutdown-delay seconds while the server keeps serving, so a load
+balancer stops sending voters here first; then the requests in flight
+finish, the job queue is drained and the tally flushed. Ctrl+C skips the
+delay.
+"""
+import _thread
+import argparse
+import logging
+import os
+import signal
+import threading
+from waitress import create_server
+
+
+def default_threads():
+    # enough to keep every core busy while the others wait on the database
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def serve(app, warm_up=None, shut_down=None, host="0.0.0.0", port=5000, threads=None, shutdown_delay=5):
+    threads = threads or default_threads()
+    # waitress logs through the app's handlers
+    if app.logger.level == logging.NOTSET:
+        app.logger.setLevel(logging.INFO)
+    for handler in app.logger.handlers:
+        logging.getLogger("waitress").addHandler(handler)
+    app.config["READY"] = False
+
+    if warm_up is not None:
+        warm_up(threads)
+
+    server = create_server(app, host=host, port=port, threads=threads, ident="nominex")
+
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        # waitress finishes the requests in flight when the loop is
+        # interrupted; until then health checks see 503 and new voters are
+        # still served
+        if stopping.is_set():
+            return
+        stopping.set()
+        app.config["READY"] = False
+        if not shutdown_delay:
+            raise SystemExit(0)
+        app.logger.info("Shutting down in %ss", shutdown_delay)
+        timer = threading.Timer(shutdown_delay, _thread.interrupt_main)
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGTERM, stop)
+
+    app.config["READY"] = True
+    app.logger.info("Serving on http://%s:%s with %d threads", host, port, threads)
+    try:
+        server.run()
+    finally:
+        app.config["READY"] = False
+        server.close()
+        if shut_down is not None:
+            shut_down()
+
+
+def cli(app, warm_up=None, shut_down=None, argv=None):
+    parser = argparse.ArgumentParser(description="Serve Nominex with waitress.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WEB_THREADS", 0)) or None,
+                        help=f"worker threads (default {default_threads()}, from the CPU count)")
+    parser.add_argument("--shutdown-delay", type=float, default=float(os.environ.get("SHUTDOWN_DELAY", 5)),
+                        help="seconds /healthz answers 503 after SIGTERM before the server stops (default 5)")
+    args = parser.parse_args(argv)
+
+    serve(app, warm_up, shut_down, host=args.host, port=args.port, threads=args.threads,
+          shutdown_delay=args.shutdown_delay)
+
+
+if __name__ == "__main__":
+    import main
+
+    cli(main.app, main.warm_up, main.shut_down)
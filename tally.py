@@ -0,0 +1,197 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+
+class Tally:
+    def __init__(self, load, flush, sync, flush_interval=2, reconcile_interval=60, logger=None):
+        self.load = load                # -> rows of (candidate_id, votes) from the votes table
+        self.flush_rows = flush         # writes [(delta, candidate_id), ...] to candidates.total_votes
+        self.sync = sync                # rewrites candidates.total_votes from the votes table
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # keyed by candidate only: a candidate moved to another position keeps
+        # its votes, the live results group them by the current position
+        self._votes = defaultdict(int)          # candidate id -> votes
+        self._pending = defaultdict(int)        # candidate id -> votes not yet flushed
+        self._listeners = []
+        self._thread = None
+        self._stop = threading.Event()
+
+        # metrics
+        self.version = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+        self.reconciles = 0
+        self.drift_events = 0
+        self.drift_votes = 0
+        self.last_drift = {}
+        self.last_reconcile_ms = 0.0
+        self.last_reconcile_at = None
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _changed(self):
+        # listeners run outside our lock, they take their own
+        for listener in self._listeners:
+            listener()
+
+    def start(self):
+        if self._thread is not None:
+            return False
+
+        with self._start_lock:
+            if self._thread is not None:
+                return False
+            self.rebuild()
+            self._thread = threading.Thread(target=self._run, name="tally", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval * 2)
+        self._safely(self.flush)
+
+    def _safely(self, step):
+        try:
+            step()
+        except Exception:
+            if self.logger is not None:
+                self.logger.exception("Tally %s failed", step.__name__)
+
+    def _run(self):
+        next_reconcile = time.monotonic() + self.reconcile_interval
+        while not self._stop.wait(self.flush_interval):
+            self._safely(self.flush)
+            if time.monotonic() >= next_reconcile:
+                self._safely(self.reconcile)
+                next_reconcile = time.monotonic() + self.reconcile_interval
+
+    def _add(self, candidate_id, amount, pending=True):
+        self._votes[candidate_id] += amount
+        if pending:
+            self._pending[candidate_id] += amount
+
+    def record(self, selections):
+        # called once the ballot's transaction has committed; selections maps
+        # position id -> candidate id, exactly what went into the votes table
+        if self.start():
+            # the rebuild just read this ballot back from the votes table
+            return
+        with self._lock:
+            for candidate_id in selections.values():
+                self._add(candidate_id, 1)
+            self.version += 1
+        self._changed()
+
+    def counts(self):
+        self.start()
+        with self._lock:
+            return dict(self._votes)
+
+    def flush(self):
+        with self._lock:
+            rows = [(delta, candidate_id) for candidate_id, delta in self._pending.items() if delta]
+            self._pending.clear()
+        if not rows:
+            return 0
+
+        try:
+            self.flush_rows(rows)
+        except Exception:
+            # put the deltas back, the next flush retries them
+            with self._lock:
+                for delta, candidate_id in rows:
+                    self._pending[candidate_id] += delta
+                self.flush_errors += 1
+            raise
+
+        with self._lock:
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+        return len(rows)
+
+    def _snapshot(self):
+        with self._lock:
+            return dict(self._votes)
+
+    def reconcile(self):
+        # a ballot is recorded here just after its commit, so a vote can be in
+        # the table but not yet in memory. Counts are only corrected when the
+        # table falls outside what memory held before and after the query.
+        # Corrections are not flushed: whoever wrote those votes owns their
+        # share of total_votes, and rebuild() rewrites the column outright.
+        started = time.perf_counter()
+        before = self._snapshot()
+        rows = self.load()
+        after = self._snapshot()
+
+        drift = {}
+        with self._lock:
+            seen = set()
+            for candidate_id, votes in rows:
+                seen.add(candidate_id)
+                low, high = before.get(candidate_id, 0), after.get(candidate_id, 0)
+                if votes > high:
+                    drift[candidate_id] = votes - high
+                elif votes < low:
+                    drift[candidate_id] = votes - low
+                if candidate_id in drift:
+                    self._add(candidate_id, drift[candidate_id], pending=False)
+
+            for candidate_id, votes in before.items():
+                if candidate_id not in seen and votes:
+                    drift[candidate_id] = -votes
+                    self._add(candidate_id, -votes, pending=False)
+
+            self.reconciles += 1
+            self.last_drift = drift
+            self.last_reconcile_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.last_reconcile_at = time.time()
+            if drift:
+                self.drift_events += 1
+                self.drift_votes += sum(abs(d) for d in drift.values())
+                self.version += 1
+
+        if drift:
+            self._changed()
+        return drift
+
+    def rebuild(self):
+        # the votes table is the source of truth; total_votes is rewritten from
+        # it too, so deltas lost to a crash before their flush are recovered
+        rows = self.load()
+        self.sync()
+        with self._lock:
+            self._votes = defaultdict(int, {candidate_id: votes for candidate_id, votes in rows})
+            self._pending.clear()
+            self.version += 1
+        self._changed()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "candidates": len(self._votes),
+                "votes": sum(self._votes.values()),
+                "version": self.version,
+                "pending": sum(self._pending.values()),
+                "flushes": self.flushes,
+                "flushed_rows": self.flushed_rows,
+                "flush_errors": self.flush_errors,
+                "reconciles": self.reconciles,
+                "drift_events": self.drift_events,
+                "drift_votes": self.drift_votes,
+                "last_drift": dict(self.last_drift),
+                "last_reconcile_ms": self.last_reconcile_ms,
+                "last_reconcile_at": self.last_reconcile_at
+            }
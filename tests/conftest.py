@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# main.py reads its configuration at import time, so the app is pointed at a
+# throwaway SQLite database and journal before it is imported
+WORKDIR = tempfile.mkdtemp(prefix="nominex-tests-")
+os.environ.update(
+    SECRET_KEY="test",
+    DB_BACKEND="sqlite",
+    SQLITE_PATH=os.path.join(WORKDIR, "test.db"),
+    BALLOT_JOURNAL=os.path.join(WORKDIR, "ballots.journal"),
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+TABLES = ["votes", "final_results", "candidates", "positions", "voting_codes", "election_sessions", "admin"]
+
+
+@pytest.fixture
+def app():
+    main.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return main.app
+
+
+@pytest.fixture
+def db(app):
+    for table in TABLES:
+        main.db.delete_all(table)
+    main.ballot_changed()
+    yield main.db
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+    return client
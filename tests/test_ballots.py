@@ -0,0 +1,47 @@
+import threading
+import main
+
+
+def election(db):
+    db.insert("positions", ["id", "name"], [1, "President"])
+    db.insert_many("candidates", ["id", "full_name", "position_id"], [[1, "Ama Mensah", 1], [2, "Kofi Boateng", 1]])
+    db.insert("voting_codes", ["id", "code", "has_voted"], [1, "TWICE2", "No"])
+    main.ballot_changed()
+
+
+def test_a_code_is_redeemed_once_however_many_ballots_race(db):
+    election(db)
+    entries = [
+        {"code": "TWICE2", "voting_code_id": 1, "votes": votes, "timestamp": "2026-01-01T08:00:00"}
+        for votes in ([(1, 1)], [(1, 2)], [])
+    ]
+    start = threading.Barrier(len(entries))
+    results = []
+
+    def apply(entry):
+        start.wait()
+        results.append((main.apply_ballot(entry), entry["votes"]))
+
+    threads = [threading.Thread(target=apply, args=(entry,)) for entry in entries]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [votes for applied, votes in results if applied]
+    assert len(results) == 3 and len(winners) == 1
+    assert db.count_rows("votes") == len(winners[0])
+    assert db.read("voting_codes", {"code": "TWICE2"}, columns=["has_voted"])[0].has_voted == "Yes"
+
+
+def test_two_browsers_with_one_code_vote_once(app, db):
+    election(db)
+    browsers = [app.test_client(), app.test_client()]
+    for browser in browsers:
+        browser.post("/", data={"vote_code": "TWICE2"})
+
+    answers = [browser.post("/vote", data={"vote_1": "1"}).location for browser in browsers]
+    main.journal.drain()
+
+    assert answers == ["/thank-you", "/"]
+    assert db.count_rows("votes") == 1
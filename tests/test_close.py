@@ -0,0 +1,52 @@
+import main
+from jobs import Job
+
+
+def test_ballots_are_held_off_while_the_election_closes(db, monkeypatch):
+    db.insert("election_sessions", ["id", "name", "active"], [1, "2026 elections", 1])
+    execute = db.execute
+    locked = []
+
+    def watch(sql, values=()):
+        locked.append(main.ballot_lock.locked())
+        return execute(sql, values)
+
+    monkeypatch.setattr(db, "execute", watch)
+    main.close_job(Job("close"), 1)
+
+    assert locked == [True]
+
+
+def election(db):
+    db.insert("election_sessions", ["id", "name", "active"], [1, "2026 elections", 1])
+    db.insert("positions", ["id", "name"], [1, "President"])
+    # total_votes is a cache the ranking must not trust
+    db.insert_many(
+        "candidates", ["id", "full_name", "position_id", "total_votes"],
+        [[1, "Ama Mensah", 1, 0], [2, "Kofi Boateng", 1, 0], [3, "Esi Owusu", 1, 99]]
+    )
+    db.insert_many("voting_codes", ["id", "code", "has_voted"], [[i, f"CLOSE{i}", "Yes"] for i in range(1, 6)])
+    db.insert_many(
+        "votes", ["voting_code_id", "candidate_id", "position_id"],
+        [[1, 2, 1], [2, 1, 1], [3, 2, 1], [4, 1, 1], [5, 3, 1]]
+    )
+
+
+def test_close_ranks_from_the_votes_table_with_ties_to_the_lower_id(db):
+    election(db)
+
+    main.close_job(Job("close"), 1)
+
+    rows = db.query("SELECT candidate_id, total_votes, `rank` FROM final_results WHERE session_id = %s ORDER BY `rank`", [1])
+    assert [tuple(row) for row in rows] == [(1, 2, 1), (2, 2, 2), (3, 1, 3)]
+
+
+def test_closing_twice_changes_nothing(db):
+    election(db)
+    main.close_job(Job("close"), 1)
+
+    job = Job("close")
+    main.close_job(job, 1)
+
+    assert job.message == "Election is already closed."
+    assert db.count_rows("final_results") == 3
@@ -0,0 +1,41 @@
+import main
+
+
+def test_code_search_matches_prefix(db, admin):
+    db.insert_many("voting_codes", ["code", "has_voted"], [["AB12", "No"], ["AB34", "No"], ["XAB1", "No"]])
+
+    page = admin.get("/admin/generate-codes?q=ab").get_data(as_text=True)
+
+    assert "AB12" in page and "AB34" in page
+    assert "XAB1" not in page
+
+
+def test_code_search_wildcards_match_literally(db, admin):
+    db.insert_many("voting_codes", ["code", "has_voted"], [["A%B1", "No"], ["AXB1", "No"], ["A_C1", "No"], ["AYC1", "No"]])
+
+    assert [row.code for row in db.read("voting_codes", {"code": "A%"}, prefix=["code"])] == ["A%B1"]
+    assert [row.code for row in db.read("voting_codes", {"code": "A_"}, prefix=["code"])] == ["A_C1"]
+    assert db.count_rows("voting_codes", {"code": "A!"}, prefix=["code"]) == 0
+
+    page = admin.get("/admin/generate-codes?q=A%25").get_data(as_text=True)
+    assert "A%B1" in page and "AXB1" not in page
+
+
+def test_code_reset_waits_for_journaled_ballots(db, admin, monkeypatch):
+    db.insert("voting_codes", ["code", "has_voted"], ["WAIT1", "No"])
+    monkeypatch.setattr(main.journal, "drain", lambda timeout=30: False)
+
+    admin.post("/admin/generate-codes", data={"action": "reset"})
+
+    assert db.count_rows("voting_codes") == 1
+
+
+def test_code_reset_reloads_the_journal_codes(db, admin, monkeypatch):
+    db.insert("voting_codes", ["code", "has_voted"], ["OLD1", "No"])
+    main.journal.start()
+    main.journal._codes.add("OLD1")     # journaled, then refused by the database
+
+    admin.post("/admin/generate-codes", data={"action": "reset"})
+
+    assert db.count_rows("voting_codes") == 0
+    assert not main.journal.seen("OLD1")
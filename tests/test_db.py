@@ -0,0 +1,11 @@
+import pytest
+
+
+def test_select_rejects_unchecked_sql(db):
+    assert db.read("voting_codes", columns=["COUNT(*)", "MAX(id)"])[0] == (0, None)
+    assert db.read("voting_codes", columns=["id"], order_by="id DESC, code") == []
+
+    with pytest.raises(ValueError):
+        db.read("voting_codes", columns=["id FROM admin --"])
+    with pytest.raises(ValueError):
+        db.read("voting_codes", columns=["id"], order_by="id; DROP TABLE votes")
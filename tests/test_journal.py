@@ -0,0 +1,165 @@
+import json
+import time
+import pytest
+import main
+from jobs import Job
+from journal import AlreadyApplied, BallotJournal
+
+
+def ballot(code, votes=()):
+    return {"code": code, "voting_code_id": 1, "votes": list(votes), "timestamp": "2026-01-01T08:00:00"}
+
+
+def election(db, code):
+    db.insert("positions", ["id", "name"], [1, "President"])
+    db.insert_many("candidates", ["id", "full_name", "position_id"], [[1, "Ama Mensah", 1], [2, "Kofi Boateng", 1]])
+    db.insert("voting_codes", ["id", "code", "has_voted"], [1, code, "No"])
+    main.ballot_changed()
+
+
+def test_codes_used_before_a_restart_are_refused(tmp_path):
+    journal = BallotJournal(str(tmp_path / "ballots.journal"), lambda entry: True, lambda: ["USED1"])
+    try:
+        assert journal.seen("USED1")
+        assert journal.submit(ballot("USED1")) is None
+        journal.wait(journal.submit(ballot("FRESH1")))
+        assert journal.drain()
+    finally:
+        journal.stop()
+
+
+def test_replayed_ballot_already_applied_is_not_rejected(tmp_path):
+    path = tmp_path / "ballots.journal"
+    path.write_text(json.dumps(ballot("DONE1")) + "\n")
+
+    def apply(entry):
+        raise AlreadyApplied(entry["code"])
+
+    journal = BallotJournal(str(path), apply)
+    try:
+        assert journal.drain()
+        stats = journal.stats()
+        assert stats["duplicates"] == 1 and stats["rejected"] == 0
+    finally:
+        journal.stop()
+
+
+def test_apply_ballot_twice_is_already_applied(db):
+    election(db, "TWICE1")
+    entry = ballot("TWICE1", [(1, 2)])
+
+    assert main.apply_ballot(entry) is True
+    with pytest.raises(AlreadyApplied):
+        main.apply_ballot(json.loads(json.dumps(entry)))
+
+
+def test_reset_forgets_the_old_codes(db):
+    election(db, "RESET1")
+    main.journal.wait(main.journal.submit(ballot("RESET1", [(1, 1)])))
+
+    main.reset_job(Job("reset"))
+
+    assert not main.journal.seen("RESET1")
+
+
+def test_ballot_for_a_deleted_candidate_is_refused(app, db, admin):
+    election(db, "GONE1")
+    voter = app.test_client()
+    voter.post("/", data={"vote_code": "GONE1"})
+
+    admin.post("/admin/edit-candidate/2", data={"action": "delete_candidate", "candidate_id": "2"})
+    assert not db.read("candidates", {"id": 2})
+    response = voter.post("/vote", data={"vote_1": "2"})
+
+    assert response.location.endswith("/vote")
+    assert not main.journal.seen("GONE1")
+
+
+def test_voters_are_not_locked_out_while_the_journal_drains(monkeypatch):
+    def stalled(timeout=30):
+        # a voter could take the lock while the database is stalled
+        assert main.ballot_lock.acquire(blocking=False)
+        main.ballot_lock.release()
+        return False
+
+    monkeypatch.setattr(main.journal, "drain", stalled)
+    with main.ballots_paused() as saved:
+        assert saved is False
+
+
+def test_a_broken_entry_does_not_hold_up_the_rest(tmp_path):
+    def apply(entry):
+        if entry["code"] == "BROKEN1":
+            raise KeyError("voting_code_id")
+        return True
+
+    journal = BallotJournal(str(tmp_path / "ballots.journal"), apply, retry_interval=0.01)
+    try:
+        for code in ("BROKEN1", "GOOD1"):
+            journal.wait(journal.submit(ballot(code)))
+        assert journal.drain(5)
+        stats = journal.stats()
+        assert stats["rejected"] == 1 and stats["applied"] == 1 and stats["apply_errors"] == 0
+    finally:
+        journal.stop()
+
+
+def test_an_unreachable_database_is_retried(tmp_path):
+    outages = [ConnectionError("database is down")]
+
+    def apply(entry):
+        if outages:
+            raise outages.pop()
+        return True
+
+    journal = BallotJournal(str(tmp_path / "ballots.journal"), apply, retry_interval=0.01)
+    try:
+        journal.wait(journal.submit(ballot("LATER1")))
+        assert journal.drain(5)
+        stats = journal.stats()
+        assert stats["applied"] == 1 and stats["apply_errors"] == 1
+    finally:
+        journal.stop()
+
+
+def test_a_failed_write_fails_the_ballot(tmp_path):
+    journal = BallotJournal(str(tmp_path / "ballots.journal"), lambda entry: True)
+    try:
+        journal.start()
+        journal._file.close()       # what stop() does once its join times out
+
+        with pytest.raises(ValueError):
+            journal.wait(journal.submit(ballot("CLOSED1")))
+        assert not journal.seen("CLOSED1")
+    finally:
+        journal.stop()
+
+
+def test_wait_gives_up_when_nothing_is_written(tmp_path):
+    journal = BallotJournal(str(tmp_path / "ballots.journal"), lambda entry: True, sync_timeout=0.05)
+    journal._started = True         # no writer thread
+
+    with pytest.raises(TimeoutError):
+        journal.wait(journal.submit(ballot("STUCK1")))
+    assert not journal.seen("STUCK1")
+
+
+def test_ballots_are_journaled_before_the_used_codes_can_be_loaded(tmp_path):
+    outages = [ConnectionError("database is down")]
+
+    def used():
+        if outages:
+            raise outages.pop()
+        return ["USED2"]
+
+    journal = BallotJournal(str(tmp_path / "ballots.journal"), lambda entry: True, used, retry_interval=0.01)
+    try:
+        journal.wait(journal.submit(ballot("FIRST1")))
+        assert journal.drain(5)
+
+        deadline = time.monotonic() + 5
+        while not journal.seen("USED2") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert journal.submit(ballot("USED2")) is None
+    finally:
+        journal.stop()
@@ -0,0 +1,82 @@
+import http.client
+import threading
+import pytest
+from waitress import create_server
+import main
+from live import LiveResults
+
+
+class StubTally:
+    def __init__(self, counts):
+        self._counts = counts
+
+    def subscribe(self, listener):
+        pass
+
+    def counts(self):
+        return dict(self._counts)
+
+
+def load():
+    return [(1, "Head Boy")], [(10, "Ama", 1), (11, "Kofi", 1)]
+
+
+def test_zero_rate_means_no_throttle():
+    live = LiveResults(load, StubTally({10: 3, 11: 1}), max_rate=0)
+    events = live.stream(heartbeat=0.01)
+
+    assert next(events) == "retry: 3000\n\n"
+    assert next(events).startswith("event: delta")
+    assert next(events) == ": keep-alive\n\n"
+
+
+def test_negative_rate_is_rejected():
+    with pytest.raises(ValueError):
+        LiveResults(load, StubTally({}), max_rate=-1)
+
+
+def test_stream_ends_after_max_age():
+    live = LiveResults(load, StubTally({10: 3, 11: 1}), max_rate=0, max_age=0.05)
+
+    events = list(live.stream(heartbeat=0.01))
+
+    assert events[0] == "retry: 3000\n\n"
+    assert events[1].startswith("event: delta")
+    assert events[-1] == ": keep-alive\n\n"
+
+
+def test_streams_past_the_cap_leave_threads_for_health_checks(app, db, monkeypatch):
+    # three request threads, two of them may be held by results streams
+    monkeypatch.setattr(main, "live_results", LiveResults(main.load_live_results, main.tally, max_streams=2))
+    server = create_server(app, host="127.0.0.1", port=0, threads=3)
+    threading.Thread(target=server.run, daemon=True).start()
+    cookie = app.session_interface.get_signing_serializer(app).dumps({"logged_in": True})
+    headers = {"Cookie": f"{app.config['SESSION_COOKIE_NAME']}={cookie}"}
+
+    def get(path):
+        connection = http.client.HTTPConnection("127.0.0.1", server.effective_port, timeout=5)
+        connection.request("GET", path, headers=headers)
+        return connection, connection.getresponse()
+
+    streams = []
+    try:
+        for _ in range(2):
+            connection, response = get("/admin/results/stream")
+            assert response.status == 200
+            assert response.readline() == b"retry: 3000\n"
+            streams.append(connection)
+        assert main.live_results.streams == 2
+
+        connection, response = get("/admin/results/stream")
+        assert response.status == 503
+        assert response.read() == b"retry: 30000\n\n"
+        connection.close()
+
+        connection, response = get("/healthz")
+        assert response.status == 200
+        connection.close()
+    finally:
+        for connection in streams:
+            connection.close()
+        # closed on the server's own loop thread, which is still polling it
+        server.trigger.pull_trigger(server.close)
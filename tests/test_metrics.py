@@ -0,0 +1,41 @@
+import main
+from profiling import label
+
+
+class UnbufferedCursor:
+    # what pymysql's SSCursor returns from execute before it is drained
+    def execute(self, sql, values):
+        return 18446744073709551615
+
+
+def test_metrics_report_statement_stats(client, admin):
+    client.get("/healthz")
+
+    body = admin.get("/admin/metrics").get_data(as_text=True)
+
+    assert 'nominex_db_statement_calls_total{statement="SELECT 1"}' in body
+    assert "# TYPE nominex_db_statement_max_seconds gauge" in body
+
+
+def test_statement_labels_are_escaped():
+    assert label('SELECT "a\\b"\nFROM t') == 'SELECT \\"a\\\\b\\"\\nFROM t'
+
+
+def test_unknown_rowcount_is_not_counted(db):
+    sql = "SELECT id FROM votes WHERE id > %s"
+    background = main.profiler.rows["background"]
+
+    db._run(UnbufferedCursor(), sql, (0,))
+
+    stats = next(s for s in db.statement_stats() if s["sql"] == sql)
+    assert stats["calls"] >= 1 and stats["rows"] == 0
+    assert main.profiler.rows["background"] == background
+
+
+def test_stream_counts_rows_fetched(db):
+    db.insert_many("positions", ["name"], [["President"], ["Secretary"], ["Treasurer"]])
+
+    assert len(list(db.stream("positions", columns=["id"], chunk_size=2))) == 3
+
+    stats = next(s for s in db.statement_stats() if s["sql"] == "SELECT id FROM positions")
+    assert stats["rows"] == 3
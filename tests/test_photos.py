@@ -0,0 +1,34 @@
+import io
+import struct
+import zlib
+import pytest
+from PIL import Image
+from photos import MAX_PIXELS, InvalidPhoto, PhotoStore
+
+
+def chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_header(width, height):
+    # a valid header for a bitmap that is never actually there
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", b"") + chunk(b"IEND", b"")
+
+
+def test_too_many_pixels_is_refused_before_decoding(tmp_path):
+    # above the limit but below the 2x where Pillow would raise on its own
+    with pytest.raises(InvalidPhoto, match="too large"), pytest.warns(Image.DecompressionBombWarning):
+        PhotoStore(str(tmp_path))._decode(png_header(8000, MAX_PIXELS // 8000 + 1000))
+
+
+def test_corrupt_upload_is_an_invalid_photo(tmp_path):
+    store = PhotoStore(str(tmp_path))
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 40), "red").save(buffer, "JPEG")
+
+    with pytest.raises(InvalidPhoto):
+        store._decode(buffer.getvalue()[:200])
+    with pytest.raises(InvalidPhoto):
+        store._decode(png_header(40, 40))
+    assert store._decode(buffer.getvalue()).size == (40, 40)
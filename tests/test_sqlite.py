@@ -0,0 +1,46 @@
+import pytest
+from pymysql.err import IntegrityError
+from database import migrations
+from database.sqlite import SQLiteDatabase, translate
+
+
+@pytest.fixture
+def fresh(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "fresh.db"))
+    yield db
+    db.close()
+
+
+def test_bootstrap_creates_a_migrated_schema_once(fresh):
+    assert fresh.bootstrap() is True
+
+    assert migrations.current_version(fresh) == migrations.MIGRATIONS[-1][0]
+    assert not migrations.missing_indexes(fresh)
+    assert (("code",), True) in fresh.indexes()["voting_codes"]
+    assert fresh.bootstrap() is False
+
+
+def test_statements_are_translated():
+    assert translate("SELECT id FROM votes WHERE code = %s AND has_voted = %s") == \
+        "SELECT id FROM votes WHERE code = ? AND has_voted = ?"
+    assert translate("id INT AUTO_INCREMENT PRIMARY KEY") == "id INTEGER PRIMARY KEY AUTOINCREMENT"
+
+
+def error_code(call):
+    with pytest.raises(IntegrityError) as raised:
+        call()
+    return raised.value.args[0]
+
+
+def test_integrity_errors_carry_the_mysql_codes(fresh):
+    fresh.bootstrap()
+    fresh.insert("positions", ["id", "name"], [1, "President"])
+    fresh.insert("candidates", ["id", "full_name", "position_id"], [1, "Ama Mensah", 1])
+    fresh.insert("voting_codes", ["id", "code", "has_voted"], [1, "SQL1", "Yes"])
+    fresh.insert("votes", ["voting_code_id", "candidate_id", "position_id"], [1, 1, 1])
+
+    # still referenced, missing parent, duplicate, missing value
+    assert error_code(lambda: fresh.delete("candidates", {"id": 1})) == 1451
+    assert error_code(lambda: fresh.insert("votes", ["voting_code_id", "candidate_id", "position_id"], [1, 9, 1])) == 1452
+    assert error_code(lambda: fresh.insert("voting_codes", ["code"], ["SQL1"])) == 1062
+    assert error_code(lambda: fresh.insert("positions", ["name"], [None])) == 1048
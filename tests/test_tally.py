@@ -0,0 +1,21 @@
+import main
+
+
+def cast(db, code_id, candidate_id, position_id):
+    db.insert("voting_codes", ["id", "code", "has_voted"], [code_id, f"CODE{code_id}", "Yes"])
+    db.insert("votes", ["voting_code_id", "candidate_id", "position_id"], [code_id, candidate_id, position_id])
+    main.tally.record({position_id: candidate_id})
+
+
+def test_moved_candidate_keeps_one_count(db):
+    db.insert_many("positions", ["id", "name"], [[1, "President"], [2, "Secretary"]])
+    db.insert("candidates", ["id", "full_name", "position_id"], [1, "Ama Mensah", 1])
+    main.tally.rebuild()
+
+    cast(db, 1, 1, 1)
+    db.update("candidates", {"position_id": 2}, {"id": 1})
+    cast(db, 2, 1, 2)
+
+    assert main.tally.counts() == {1: 2}
+    assert main.tally.reconcile() == {}
+    assert main.tally.stats()["votes"] == 2